@@ -0,0 +1,120 @@
+"""Mede o cold start da API (deploy_temp/app.py).
+
+- tempo de `import app` em um processo novo (e se pandas foi importado)
+- tempo até o /health responder com o servidor real (uvicorn)
+- latência da primeira requisição ao /predict
+- RSS do processo ocioso após a primeira requisição
+
+Uso:
+    python benchmarks/bench_api_cold_start.py [diretório_da_api] [--repeat N] [--python INTERPRETADOR]
+
+O diretório padrão é deploy_temp/. Para comparar com outra versão, aponte para
+uma cópia do diretório com aquele app.py (e a mesma pasta models/).
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+PAYLOAD = {
+    "galpao_str": "BUTANTAN", "dia_semana": 6, "motos_em_uso": 18,
+    "motos_disponiveis": 82, "choveu": 0, "total_motos": 100,
+    "feriado": 1, "tipo_dia_str": "FIM_DE_SEMANA", "saldo_dia": 7,
+}
+
+IMPORT_SNIPPET = (
+    "import sys, time; t = time.perf_counter(); import app; "
+    "print(time.perf_counter() - t, 'pandas' in sys.modules)"
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def measure_import(python, app_dir):
+    out = subprocess.check_output([python, "-c", IMPORT_SNIPPET], cwd=app_dir, text=True)
+    secs, pandas_loaded = out.split()[-2:]
+    return float(secs), pandas_loaded == "True"
+
+
+def measure_server(python, app_dir):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [python, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=app_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONWARNINGS": "ignore"},
+    )
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f"{base}/health", timeout=1).read()
+                break
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("API terminou antes de responder ao /health")
+                time.sleep(0.02)
+        ready = time.perf_counter() - t0
+
+        req = urllib.request.Request(
+            f"{base}/predict", data=json.dumps(PAYLOAD).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        t1 = time.perf_counter()
+        urllib.request.urlopen(req, timeout=30).read()
+        first = time.perf_counter() - t1
+
+        time.sleep(0.5)
+        return ready, first, rss_mb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("app_dir", nargs="?", default=str(Path(__file__).resolve().parents[1] / "deploy_temp"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--python", default=sys.executable,
+        help="interpretador a usar (ex.: um venv com requirements-api.txt)",
+    )
+    args = parser.parse_args()
+
+    imports, pandas_flags, readies, firsts, rsss = [], [], [], [], []
+    for _ in range(args.repeat):
+        secs, pandas_loaded = measure_import(args.python, args.app_dir)
+        imports.append(secs)
+        pandas_flags.append(pandas_loaded)
+        ready, first, rss = measure_server(args.python, args.app_dir)
+        readies.append(ready)
+        firsts.append(first)
+        rsss.append(rss)
+
+    med = statistics.median
+    print(f"import app:             {med(imports) * 1e3:8.1f} ms  (pandas importado: {any(pandas_flags)})")
+    print(f"processo -> /health ok: {med(readies) * 1e3:8.1f} ms")
+    print(f"primeiro /predict:      {med(firsts) * 1e3:8.1f} ms")
+    print(f"RSS ocioso:             {med(rsss):8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Compara previsão em lote via JSON (/predict/batch) e Arrow IPC (/predict/batch/arrow).
+
+- decodificação isolada (em processo): JSON + InputPayload + matriz vs. Arrow -> matriz
+- ponta a ponta com o servidor real (uvicorn): o JSON vai em lotes de 10 mil
+  (limite do BatchPayload) e o Arrow em uma única requisição
+
+Uso:
+    python benchmarks/bench_arrow_batch.py [--rows 100000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+APP_DIR = Path(__file__).resolve().parents[1] / "deploy_temp"
+JSON_CHUNK = 10_000
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def make_columns(n, seed=42):
+    rng = np.random.default_rng(seed)
+    total = rng.integers(50, 200, n)
+    em_uso = (total * rng.random(n)).round(0)
+    dia = rng.integers(0, 7, n)
+    return {
+        "galpao_str": rng.choice(["BUTANTAN", "LIMAO", "BARUERI", "SANTO AMARO"], n).tolist(),
+        "dia_semana": dia,
+        "motos_em_uso": em_uso,
+        "motos_disponiveis": total - em_uso,
+        "choveu": rng.integers(0, 2, n),
+        "total_motos": total,
+        "feriado": rng.integers(0, 2, n),
+        "tipo_dia": (dia >= 5).astype(np.int64),
+        "saldo_dia": rng.normal(0, 5, n).round(2),
+    }
+
+
+def json_bodies(cols):
+    n = len(cols["dia_semana"])
+    itens = [
+        {k: (v[i] if isinstance(v, list) else v[i].item()) for k, v in cols.items()}
+        for i in range(n)
+    ]
+    return [
+        json.dumps({"itens": itens[i:i + JSON_CHUNK]}).encode()
+        for i in range(0, n, JSON_CHUNK)
+    ]
+
+
+def arrow_body(cols):
+    table = pa.table({k: pa.array(v) for k, v in cols.items()})
+    # Texto repetido vai como dicionário: cada galpão é enviado uma vez só
+    i = table.column_names.index("galpao_str")
+    table = table.set_column(i, "galpao_str", table.column(i).dictionary_encode())
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def bench_decode(json_parts, arrow_bytes, repeat):
+    sys.path.insert(0, str(APP_DIR))
+    os.chdir(APP_DIR)
+    import app
+    import arrow_batch
+
+    app._init()
+
+    def via_json():
+        for body in json_parts:
+            payload = app.BatchPayload.model_validate_json(body)
+            app._payload_matrix(payload.itens)
+
+    def via_arrow():
+        arrow_batch.read_features(arrow_bytes, app.galpao_map, app.tipo_dia_map)
+
+    out = {}
+    for label, fn in (("json", via_json), ("arrow", via_arrow)):
+        fn()
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        out[label] = statistics.median(times)
+    return out
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def post(base, path, body, content_type):
+    req = urllib.request.Request(base + path, data=body, headers={"Content-Type": content_type})
+    with urllib.request.urlopen(req, timeout=300) as resp:
+        return resp.read()
+
+
+def bench_server(json_parts, arrow_bytes, repeat):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONWARNINGS": "ignore", "MOTTU_MAX_CONCURRENCY": "0"},
+    )
+    try:
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(f"{base}/health", timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.05)
+
+        def via_json():
+            for body in json_parts:
+                post(base, "/predict/batch", body, "application/json")
+
+        def via_arrow():
+            post(base, "/predict/batch/arrow", arrow_bytes, ARROW_STREAM)
+
+        out = {}
+        for label, fn in (("json", via_json), ("arrow", via_arrow)):
+            fn()
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                fn()
+                times.append(time.perf_counter() - t0)
+            out[label] = statistics.median(times)
+        return out
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cols = make_columns(args.rows)
+    json_parts = json_bodies(cols)
+    arrow_bytes = arrow_body(cols)
+    json_size = sum(len(b) for b in json_parts)
+    print(f"{args.rows} linhas | JSON: {json_size / 1e6:.1f} MB em {len(json_parts)} requisições | "
+          f"Arrow: {len(arrow_bytes) / 1e6:.1f} MB em 1 requisição")
+
+    dec = bench_decode(json_parts, arrow_bytes, args.repeat)
+    print(f"decodificação -> matriz:  JSON {dec['json'] * 1e3:8.1f} ms   Arrow {dec['arrow'] * 1e3:8.1f} ms"
+          f"   ({dec['json'] / dec['arrow']:.0f}x)")
+
+    e2e = bench_server(json_parts, arrow_bytes, args.repeat)
+    print(f"ponta a ponta (servidor): JSON {e2e['json'] * 1e3:8.1f} ms   Arrow {e2e['arrow'] * 1e3:8.1f} ms"
+          f"   ({e2e['json'] / e2e['arrow']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark de throughput do feature engineering (deploy_temp/feature_engineering.py).
+
+Mede `build_matrix` de 1 a 10M linhas e compara com o caminho antigo
+(uma linha por vez, montando um DataFrame por chamada) até 10k linhas.
+
+Uso:
+    python benchmarks/bench_feature_engineering.py
+    python benchmarks/bench_feature_engineering.py 1 1000 100000   # tamanhos específicos
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "deploy_temp"))
+from feature_engineering import FEATURES, build_matrix  # noqa: E402
+
+SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+LEGACY_MAX = 10_000
+
+
+def make_columns(n, rng):
+    total = np.full(n, 100.0)
+    em_uso = rng.integers(0, 100, n).astype(np.float64)
+    dia = rng.integers(0, 7, n).astype(np.float64)
+    return (
+        np.zeros(n), dia, em_uso, total - em_uso,
+        rng.integers(0, 2, n).astype(np.float64), total,
+        rng.integers(0, 2, n).astype(np.float64), (dia >= 5).astype(np.float64),
+        rng.integers(-20, 21, n).astype(np.float64),
+    )
+
+
+def legacy(cols):
+    """Caminho anterior: dicionário + DataFrame por linha"""
+    frames = []
+    for g, d, u, disp, c, t, f, td, s in zip(*cols):
+        row = {
+            "galpao": g, "dia_semana": d, "motos_em_uso": u, "motos_disponiveis": disp,
+            "choveu": c, "total_motos": t, "feriado": f, "tipo_dia": td, "saldo_dia": s,
+            "taxa_ocupacao": u / t, "choveu_fds": c * td, "feriado_fds": f * td,
+        }
+        frames.append(pd.DataFrame([row])[FEATURES])
+    return frames
+
+
+def timeit(fn, min_time=0.2):
+    """Melhor tempo após um aquecimento (pelo menos 3 repetições ou `min_time` segundos)"""
+    fn()
+    best, spent, reps = float("inf"), 0.0, 0
+    while spent < min_time or reps < 3:
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best, spent, reps = min(best, dt), spent + dt, reps + 1
+    return best
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    rng = np.random.default_rng(42)
+
+    print(f"{'linhas':>12} {'build_matrix':>14} {'linhas/s':>14} {'antigo':>12} {'ganho':>10}")
+    for n in sizes:
+        cols = make_columns(n, rng)
+        t_new = timeit(lambda: build_matrix(*cols))
+
+        if n <= LEGACY_MAX:
+            t_old = timeit(lambda: legacy(cols))
+            old_txt, gain_txt = f"{t_old * 1e3:10.2f}ms", f"{t_old / t_new:9.0f}x"
+        else:
+            old_txt, gain_txt = f"{'-':>12}", f"{'-':>10}"
+
+        print(f"{n:>12,} {t_new * 1e3:12.3f}ms {n / t_new:>14,.0f} {old_txt} {gain_txt}")
+        del cols
+
+
+if __name__ == "__main__":
+    main()
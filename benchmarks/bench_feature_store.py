@@ -0,0 +1,64 @@
+"""Mede o feature store por galpão (deploy_temp/feature_store.py).
+
+- latência de um evento (lê, altera e regrava o snapshot do galpão)
+- latência da consulta usada pelo /predict/galpao, com poucos e com muitos galpões
+- "restart": instância nova até a primeira consulta respondida
+- visibilidade entre processos (outra instância sobre o mesmo diretório)
+
+Uso:
+    python benchmarks/bench_feature_store.py [--galpoes 100,10000]
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "deploy_temp"))
+
+from feature_store import FeatureStore  # noqa: E402
+
+
+def timeit(fn, n):
+    tempos = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - t)
+    return statistics.median(tempos) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--galpoes", default="100,10000")
+    args = parser.parse_args()
+
+    for n in map(int, args.galpoes.split(",")):
+        with tempfile.TemporaryDirectory() as d:
+            store = FeatureStore(Path(d))
+            t0 = time.perf_counter()
+            for i in range(n):
+                store.frota(f"GALPAO {i}", 20, 80)
+                store.observacao(f"GALPAO {i}", date(2025, 11, 1), 25, 18)
+            carga = (time.perf_counter() - t0) / (2 * n) * 1e6
+
+            alvo = f"GALPAO {n // 2}"
+            dia = date(2025, 11, 2)
+            consulta = timeit(lambda: store.saldo_anterior(store.get(alvo), dia), 20000)
+
+            t0 = time.perf_counter()
+            nova = FeatureStore(Path(d))
+            nova.saldo_anterior(nova.get(alvo), dia)
+            restart = (time.perf_counter() - t0) * 1e3
+
+            store.observacao(alvo, dia - timedelta(days=1), 40, 10)
+            visivel = nova.get(alvo)["saldo_ultimo"] == 30.0
+
+            print(f"{n:>6d} galpões: evento {carga:7.1f} us | consulta {consulta:5.1f} us | "
+                  f"restart até 1ª consulta {restart:5.2f} ms | visível em outra instância: {visivel}")
+
+
+if __name__ == "__main__":
+    main()
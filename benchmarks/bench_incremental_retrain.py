@@ -0,0 +1,106 @@
+"""Tempo do retreino incremental (deploy_temp/retrain.py) vs. tamanho do histórico e dos dias novos.
+
+Monta históricos sintéticos (linhas do CSV real repetidas com ruído) em um diretório
+temporário e mede `retreinar`:
+- histórico crescente com 30 dias novos fixos
+- dias novos crescentes com histórico fixo
+Como referência, mede também o retreino completo (2 x 300 árvores, como no notebook).
+
+Uso:
+    python benchmarks/bench_incremental_retrain.py [--historicos 250,10000,100000,1000000]
+"""
+import argparse
+import csv
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "deploy_temp"))
+
+from feature_engineering import build_frame_matrix, load_spec  # noqa: E402
+from retrain import COLUNAS, columns, retreinar  # noqa: E402
+from sklearn.ensemble import RandomForestRegressor  # noqa: E402
+
+
+def synthetic_rows(base, n, rng):
+    idx = rng.integers(0, len(base), n)
+    rows = [list(base[i]) for i in idx]
+    ruido = rng.integers(-2, 3, (n, 2))
+    for r, (a, b) in zip(rows, ruido):
+        r[3] = str(max(0, int(r[3]) + a))
+        r[4] = str(max(0, int(r[4]) + b))
+    return rows
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(header)
+        w.writerows(rows)
+
+
+def run_incremental(tmp, header, historico, novos, repeat=3):
+    tempos = []
+    for _ in range(repeat):
+        models = tmp / "models"
+        shutil.rmtree(models, ignore_errors=True)
+        shutil.copytree(ROOT / "models", models)
+        write_csv(tmp / "dados.csv", header, historico)
+        write_csv(tmp / "novos.csv", header, novos)
+        out = retreinar(tmp / "novos.csv", tmp / "dados.csv", models, seed=0)
+        tempos.append(out["tempos"]["total_s"])
+    return float(np.median(tempos))
+
+
+def run_full(header, rows):
+    cols = columns(header, rows)
+    X = build_frame_matrix(cols, load_spec(ROOT / "models")["galpao_map"])
+    t0 = time.perf_counter()
+    for alvo in ("motos_que_sairam", "motos_que_voltaram"):
+        RandomForestRegressor(
+            n_estimators=300, max_depth=10, min_samples_split=5, min_samples_leaf=2,
+            random_state=42, n_jobs=-1,
+        ).fit(X, cols[alvo])
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--historicos", default="250,10000,100000,1000000")
+    parser.add_argument("--dias-novos", default="7,30,365,3650,36500")
+    parser.add_argument("--completo-ate", type=int, default=100_000, help="maior histórico com retreino completo")
+    args = parser.parse_args()
+
+    with open(ROOT / "dados_mottu_corrigido.csv", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        base = [r for r in reader if r]
+    assert header == COLUNAS
+    rng = np.random.default_rng(42)
+
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        print("Histórico crescente, 30 dias novos:")
+        novos = synthetic_rows(base, 30, rng)
+        for n in map(int, args.historicos.split(",")):
+            historico = synthetic_rows(base, n, rng)
+            inc = run_incremental(tmp, header, historico, novos)
+            linha = f"  histórico {n:>9,d}: incremental {inc:6.2f}s"
+            if n <= args.completo_ate:
+                linha += f" | completo {run_full(header, historico + novos):7.2f}s"
+            print(linha)
+
+        print("Dias novos crescentes, histórico de 100.000:")
+        historico = synthetic_rows(base, 100_000, rng)
+        for n in map(int, args.dias_novos.split(",")):
+            inc = run_incremental(tmp, header, historico, synthetic_rows(base, n, rng))
+            print(f"  dias novos {n:>6,d}: incremental {inc:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
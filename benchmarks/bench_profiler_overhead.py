@@ -0,0 +1,67 @@
+"""Mede o custo do profiler por amostragem sobre o /predict (em processo).
+
+Três situações, cada uma em um processo novo:
+- desabilitado (sem MOTTU_ADMIN_TOKEN): o endpoint é a função original
+- habilitado, sem sessão ativa
+- sessão ativa perfilando 100% das requisições
+
+Uso:
+    python benchmarks/bench_profiler_overhead.py [--calls 2000] [--intervalo-ms 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1] / "deploy_temp"
+
+SNIPPET = """
+import statistics, sys, time
+import app
+app._init()
+inp = app.InputPayload(galpao_str="BUTANTAN", dia_semana=6, motos_em_uso=18, motos_disponiveis=82,
+                       choveu=0, total_motos=100, feriado=1, tipo_dia_str="FIM_DE_SEMANA", saldo_dia=7)
+calls, intervalo, ativo = int(sys.argv[1]), float(sys.argv[2]), sys.argv[3] == "1"
+for _ in range(50):
+    app.predict(inp)
+if ativo:
+    app.profiler.start(duracao=600, amostra=1.0, intervalo=intervalo / 1000, todas_threads=False)
+times = []
+for _ in range(calls):
+    t = time.perf_counter()
+    app.predict(inp)
+    times.append(time.perf_counter() - t)
+app.profiler.stop()
+times.sort()
+print(statistics.median(times) * 1e3, times[int(0.99 * len(times))] * 1e3, app.profiler.amostras)
+"""
+
+
+def run(calls, intervalo, token, ativo):
+    env = {**os.environ, "PYTHONWARNINGS": "ignore", "MOTTU_MODEL_N_JOBS": "1", "MOTTU_ADMIN_TOKEN": token}
+    out = subprocess.check_output(
+        [sys.executable, "-c", SNIPPET, str(calls), str(intervalo), "1" if ativo else "0"],
+        cwd=APP_DIR, env=env, text=True, stderr=subprocess.DEVNULL,
+    )
+    p50, p99, amostras = out.split()[-3:]
+    return float(p50), float(p99), int(amostras)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--intervalo-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for label, token, ativo in (
+        ("desabilitado", "", False),
+        ("habilitado, sem sessão", "bench", False),
+        ("sessão ativa (100%)", "bench", True),
+    ):
+        p50, p99, amostras = run(args.calls, args.intervalo_ms, token, ativo)
+        print(f"{label:24s} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   amostras {amostras}")
+
+
+if __name__ == "__main__":
+    main()
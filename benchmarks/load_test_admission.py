@@ -0,0 +1,145 @@
+"""Teste de carga local do controle de admissão (/predict sob sobrecarga).
+
+Sobe a API com e sem controle de admissão, mede a capacidade com um cliente
+sequencial e então dispara requisições em malha aberta a `--overload` vezes essa
+taxa. Reporta latência das requisições admitidas (200) e das recusadas (503).
+
+Uso:
+    python benchmarks/load_test_admission.py [--overload 10] [--duration 10]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1] / "deploy_temp"
+BODY = json.dumps({
+    "galpao_str": "BUTANTAN", "dia_semana": 6, "motos_em_uso": 18,
+    "motos_disponiveis": 82, "choveu": 0, "total_motos": 100,
+    "feriado": 1, "tipo_dia_str": "FIM_DE_SEMANA", "saldo_dia": 7,
+})
+HEADERS = {"Content-Type": "application/json"}
+
+_local = threading.local()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def post(port):
+    """POST /predict em uma conexão keep-alive por thread; devolve o status"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        conn.request("POST", "/predict", BODY, HEADERS)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        _local.conn = None
+        return -1
+
+
+def start_api(env):
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONWARNINGS": "ignore", **env},
+    )
+    for _ in range(300):
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            c.request("GET", "/health")
+            if c.getresponse().status == 200:
+                return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("API não respondeu ao /health")
+
+
+def capacity(port, seconds=2.0):
+    n, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        post(port)
+        n += 1
+    return n / (time.perf_counter() - t0)
+
+
+def open_loop(port, rate, duration):
+    """Dispara `rate` req/s por `duration` s; latência medida a partir do horário agendado"""
+    results = []
+    lock = threading.Lock()
+
+    def one(scheduled):
+        status = post(port)
+        with lock:
+            results.append((status, time.perf_counter() - scheduled))
+
+    n = int(rate * duration)
+    with ThreadPoolExecutor(max_workers=256) as pool:
+        t0 = time.perf_counter()
+        for i in range(n):
+            scheduled = t0 + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one, scheduled)
+    return results, time.perf_counter() - t0
+
+
+def pct(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1e3
+
+
+def run(label, env, overload, duration):
+    proc, port = start_api(env)
+    try:
+        for _ in range(20):
+            post(port)
+        cap = capacity(port)
+        results, wall = open_loop(port, cap * overload, duration)
+        ok = [lat for st, lat in results if st == 200]
+        rej = [lat for st, lat in results if st == 503]
+        other = sum(1 for st, _ in results if st not in (200, 503))
+        print(f"\n[{label}] capacidade ~{cap:.0f} req/s, carga {cap * overload:.0f} req/s por {duration}s")
+        print(f"  admitidas (200): {len(ok):6d}  p50 {pct(ok, .5):8.1f} ms  p95 {pct(ok, .95):8.1f} ms  p99 {pct(ok, .99):8.1f} ms")
+        print(f"  recusadas (503): {len(rej):6d}  p50 {pct(rej, .5):8.1f} ms  p99 {pct(rej, .99):8.1f} ms")
+        if other:
+            print(f"  outros/erros:    {other:6d}")
+        if ok:
+            print(f"  vazão útil: {len(ok) / wall:.0f} req/s em {wall:.1f}s, latência média admitidas {statistics.mean(ok) * 1e3:.1f} ms")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--overload", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    run("sem controle de admissão", {"MOTTU_MAX_CONCURRENCY": "0"}, args.overload, args.duration)
+    run("com controle de admissão", {}, args.overload, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Controle de admissão para os endpoints de inferência.
+
+Limita quantas predições rodam ao mesmo tempo e quantas podem esperar por uma vaga.
+A espera acontece no event loop, antes de a requisição ocupar uma thread do pool
+do FastAPI; quem não conseguiria vaga dentro do prazo é recusado na hora
+(`Overloaded`), em vez de ficar na fila aumentando a latência de todos.
+"""
+import asyncio
+from typing import Dict, Optional
+
+
+class Overloaded(Exception):
+    """Requisição recusada: fila cheia ou prazo de espera esgotado"""
+
+    def __init__(self, motivo: str):
+        super().__init__(motivo)
+        self.motivo = motivo
+
+
+class AdmissionController:
+    """Semáforo com fila limitada e prazo de espera.
+
+    `max_concurrency <= 0` desativa o controle (todas as requisições são admitidas).
+    Os limites valem por processo: com vários workers, multiplique pelo número de workers.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted_total = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Criado no primeiro uso, dentro do event loop do servidor
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        return self._sem
+
+    async def acquire(self) -> None:
+        if not self.enabled:
+            self.in_flight += 1
+            self.admitted_total += 1
+            return
+
+        sem = self._semaphore()
+        if sem.locked():
+            if self.queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise Overloaded("Fila de inferência cheia")
+            if self.queue_timeout <= 0:
+                self.rejected_timeout += 1
+                raise Overloaded("Sem vaga para inferência")
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise Overloaded("Prazo de espera por inferência esgotado") from None
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        self.admitted_total += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self.enabled:
+            self._semaphore().release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout_ms": round(self.queue_timeout * 1000),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted_total": self.admitted_total,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
@@ -1,14 +1,57 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
-import pandas as pd
+from typing import Optional, Dict, Any, List, Union
+from datetime import date, datetime, timedelta
+from contextlib import asynccontextmanager
+import numpy as np
 import joblib
+import hmac
+import os
 from pathlib import Path
 
+from admission import AdmissionController, Overloaded
+from feature_store import FeatureStore
+from profiler import SamplingProfiler
+from feature_engineering import (
+    FEATURES,
+    TIPO_DIA_MAP,
+    artifacts_version,
+    build_matrix,
+    check_scaler,
+    current_models_dir,
+    galpao_map_from,
+    load_spec,
+    tipo_dia_from_dia_semana,
+)
+
 # Paths
 DATA_PATH = Path("dados_mottu_corrigido.csv")
 MODELS_DIR = Path("models")
 
+# Threads por predição das florestas; com vários workers use 1 para não disputar CPU
+MODEL_N_JOBS = os.environ.get("MOTTU_MODEL_N_JOBS")
+
+# Controle de admissão da inferência (por worker). MOTTU_MAX_CONCURRENCY=0 desativa.
+MAX_CONCURRENCY = int(os.environ.get("MOTTU_MAX_CONCURRENCY", "4"))
+MAX_QUEUE = int(os.environ.get("MOTTU_MAX_QUEUE", "16"))
+QUEUE_TIMEOUT_MS = int(os.environ.get("MOTTU_QUEUE_TIMEOUT_MS", "250"))
+RETRY_AFTER_S = int(os.environ.get("MOTTU_RETRY_AFTER_S", "1"))
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ARROW_MAX_ROWS = int(os.environ.get("MOTTU_ARROW_MAX_ROWS", "1000000"))
+ARROW_MAX_BYTES = int(os.environ.get("MOTTU_ARROW_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Feature store online: um snapshot JSON por galpão, janela de saldos em dias
+STORE_DIR = Path(os.environ.get("MOTTU_STORE_DIR", "store"))
+STORE_JANELA = int(os.environ.get("MOTTU_STORE_JANELA", "7"))
+
+# Endpoints de administração (profiler) só existem com um token configurado
+ADMIN_TOKEN = os.environ.get("MOTTU_ADMIN_TOKEN", "")
+# Sessão do profiler compartilhada entre os workers (controle e perfis por pid)
+PROFILE_DIR = Path(os.environ.get("MOTTU_PROFILE_DIR", "profile"))
+
 tags_metadata = [
     {
         "name": "health",
@@ -18,6 +61,22 @@ tags_metadata = [
         "name": "prediction",
         "description": "Endpoint principal para realizar predições de saídas e retornos de motocicletas."
     },
+    {
+        "name": "forecast",
+        "description": "Previsões de vários dias à frente, propagando o saldo previsto de um dia para o seguinte."
+    },
+    {
+        "name": "sweep",
+        "description": "Varredura de cenários: avalia a grade completa de combinações em um único lote."
+    },
+    {
+        "name": "store",
+        "description": "Feature store por galpão: estado da frota e saldos recentes, usados pelo `/predict/galpao`."
+    },
+    {
+        "name": "admin",
+        "description": "Profiler por amostragem das requisições em produção (exige `X-Admin-Token`)."
+    },
 ]
 
 app = FastAPI(
@@ -27,6 +86,11 @@ app = FastAPI(
 - Previsão de quantas motos sairão do galpão
 - Previsão de quantas motos retornarão ao galpão
 - Cálculo do saldo previsto (diferença entre saídas e retornos)
+- Previsão recursiva de vários dias para vários galpões/cenários de uma só vez
+- Varredura de cenários (grade what-if) avaliada em um único lote
+- Controle de admissão: sob sobrecarga, recusa rápida com 503 e `Retry-After`
+- Feature store por galpão: previsão só com galpão, data, chuva e feriado
+- Profiler por amostragem opcional para diagnosticar latência em produção
 - Métricas de performance dos modelos (R², MAE, RMSE)
 
 ### Equipe
@@ -51,14 +115,11 @@ app = FastAPI(
     },
 )
 
-FEATURES = [
-    "galpao","dia_semana","motos_em_uso","motos_disponiveis",
-    "choveu","total_motos","feriado","tipo_dia","saldo_dia",
-    "taxa_ocupacao","choveu_fds","feriado_fds"
-]
+SWEEP_MAX_PONTOS = 200_000
+SWEEP_EIXOS = ["dia_semana", "choveu", "feriado", "motos_em_uso", "saldo_dia"]
 
 galpao_map = {}
-tipo_dia_map = {"UTIL": 0, "FIM_DE_SEMANA": 1}
+tipo_dia_map = dict(TIPO_DIA_MAP)
 
 class InputPayload(BaseModel):
     """Modelo de entrada para previsão de demanda de motocicletas"""
@@ -233,34 +294,366 @@ class HealthResponse(BaseModel):
     galpao_map: Dict[str, int] = Field(..., description="Mapeamento de galpões disponíveis")
     tipo_dia_map: Dict[str, int] = Field(..., description="Mapeamento de tipos de dia")
     metricas: Optional[Dict[str, Any]] = Field(None, description="Métricas dos modelos")
+    model_version: Optional[str] = Field(None, description="Versão dos modelos carregados (hash dos arquivos .pkl)")
+
+class AdmissionResponse(BaseModel):
+    """Estado do controle de admissão da inferência (por worker)"""
+
+    enabled: bool = Field(..., description="Indica se o controle de admissão está ativo")
+    max_concurrency: int = Field(..., description="Predições simultâneas permitidas")
+    max_queue: int = Field(..., description="Requisições que podem aguardar vaga")
+    queue_timeout_ms: int = Field(..., description="Prazo máximo de espera por vaga, em ms")
+    in_flight: int = Field(..., description="Predições em execução agora")
+    queued: int = Field(..., description="Requisições aguardando vaga agora")
+    admitted_total: int = Field(..., description="Requisições admitidas desde o início")
+    rejected_queue_full: int = Field(..., description="Recusadas por fila cheia")
+    rejected_timeout: int = Field(..., description="Recusadas por prazo de espera esgotado")
+
+
+class FleetStateEvent(BaseModel):
+    """Evento de estado da frota de um galpão"""
+
+    galpao_str: str = Field(..., min_length=1, description="Nome do galpão", example="BUTANTAN")
+    motos_em_uso: float = Field(..., ge=0, description="Motos em uso agora", example=18)
+    motos_disponiveis: float = Field(..., ge=0, description="Motos disponíveis no galpão agora", example=82)
+    total_motos: Optional[float] = Field(
+        None, ge=1,
+        description="Total da frota (padrão: em uso + disponíveis)",
+        example=100
+    )
+    em: Optional[datetime] = Field(
+        None,
+        description="Instante do estado (padrão: agora). Eventos mais antigos que o estado atual são ignorados"
+    )
+
+
+class ObservationEvent(BaseModel):
+    """Movimento observado de um galpão em um dia"""
+
+    galpao_str: str = Field(..., min_length=1, description="Nome do galpão", example="BUTANTAN")
+    data: date = Field(..., description="Dia observado", example="2025-11-02")
+    motos_que_sairam: float = Field(..., ge=0, description="Motos que saíram no dia", example=25)
+    motos_que_voltaram: float = Field(..., ge=0, description="Motos que voltaram no dia", example=18)
+
+
+class GalpaoState(BaseModel):
+    """Estado de um galpão no feature store"""
+
+    galpao: str = Field(..., description="Nome do galpão (normalizado)")
+    motos_em_uso: Optional[float] = Field(None, description="Último estado: motos em uso")
+    motos_disponiveis: Optional[float] = Field(None, description="Último estado: motos disponíveis")
+    total_motos: Optional[float] = Field(None, description="Último estado: total da frota")
+    frota_em: Optional[str] = Field(None, description="Instante (UTC) do último estado da frota")
+    saldos: Dict[str, float] = Field(..., description="Saldos diários (saídas - retornos) da janela móvel, por data")
+    ultima_data: Optional[str] = Field(None, description="Data da observação mais recente")
+    saldo_ultimo: Optional[float] = Field(None, description="Saldo da observação mais recente")
+    saldo_medio: Optional[float] = Field(None, description="Média dos saldos da janela")
+
+
+class GalpaoPredictPayload(BaseModel):
+    """Previsão leve: o restante das features vem do feature store"""
+
+    galpao_str: str = Field(..., min_length=1, description="Nome do galpão", example="BUTANTAN")
+    data: date = Field(..., description="Dia a prever (define dia da semana e tipo de dia)", example="2025-11-03")
+    choveu: int = Field(0, ge=0, le=1, description="Previsão de chuva: 0=Não, 1=Sim", example=0)
+    feriado: int = Field(0, ge=0, le=1, description="Feriado: 0=Não, 1=Sim", example=0)
+
+
+class GalpaoPredictionResponse(BaseModel):
+    """Previsão de um dia com as features obtidas do feature store"""
+
+    galpao: str = Field(..., description="Nome do galpão (normalizado)")
+    data: date = Field(..., description="Dia previsto")
+    motos_que_sairam: float = Field(..., description="Quantidade prevista de motos que sairão do galpão")
+    motos_que_voltaram: float = Field(..., description="Quantidade prevista de motos que retornarão ao galpão")
+    saldo_previsto: float = Field(..., description="Saldo previsto (saídas - retornos)")
+    features: Dict[str, float] = Field(..., description="Features usadas na previsão (mesmos nomes do /predict)")
+    saldo_de: Optional[str] = Field(
+        None,
+        description="Data da observação usada como `saldo_dia` (nula: sem observação anterior, saldo 0)"
+    )
+    frota_em: str = Field(..., description="Instante (UTC) do estado da frota usado")
+    model_version: Optional[str] = Field(None, description="Versão dos modelos usados")
+
+
+class ProfileStartPayload(BaseModel):
+    """Parâmetros de uma sessão do profiler"""
+
+    duracao_s: float = Field(30, gt=0, le=600, description="Janela de tempo da sessão, em segundos")
+    amostra: float = Field(
+        1.0, gt=0, le=1,
+        description="Fração das requisições de inferência perfiladas durante a janela"
+    )
+    intervalo_ms: float = Field(5, ge=1, le=100, description="Intervalo entre amostras de pilha, em ms")
+    todas_threads: bool = Field(
+        False,
+        description="Amostra todas as threads do processo (inclui os workers do joblib quando n_jobs > 1)"
+    )
+
+
+class ProfileFrame(BaseModel):
+    """Frame com o percentual das amostras em que aparece"""
+
+    frame: str = Field(..., description="módulo:função")
+    inclusivo_pct: float = Field(..., description="% das amostras com este frame em qualquer ponto da pilha")
+    proprio_pct: float = Field(..., description="% das amostras com este frame no topo da pilha")
+
+
+class ProfileResponse(BaseModel):
+    """Estado da sessão do profiler, somado entre os workers"""
+
+    enabled: bool = Field(..., description="Profiler habilitado (MOTTU_ADMIN_TOKEN definido)")
+    ativo: bool = Field(..., description="Há uma sessão coletando amostras agora")
+    amostra: float = Field(..., description="Fração das requisições perfiladas")
+    intervalo_ms: float = Field(..., description="Intervalo entre amostras, em ms")
+    todas_threads: bool = Field(..., description="Amostrando todas as threads do processo")
+    duracao_s: float = Field(..., description="Tempo decorrido da sessão, em segundos")
+    amostras: int = Field(..., description="Pilhas coletadas")
+    requisicoes_perfiladas: int = Field(..., description="Requisições sorteadas para o perfil")
+    requisicoes_ignoradas: int = Field(..., description="Requisições fora da amostra")
+    pilhas_distintas: int = Field(..., description="Pilhas diferentes no perfil")
+    pid: int = Field(..., description="Worker que atendeu esta consulta")
+    workers: List[int] = Field(..., description="Workers (pids) cujos perfis entraram na soma")
+    top: List[ProfileFrame] = Field(..., description="Frames com mais tempo inclusivo")
+
+
+class BatchPayload(BaseModel):
+    """Modelo de entrada para previsão em lote"""
+
+    itens: List[InputPayload] = Field(
+        ...,
+        min_length=1,
+        max_length=10000,
+        description="Cenários a prever; todos são avaliados em uma única chamada aos modelos"
+    )
+
+
+class BatchPredictionResponse(BaseModel):
+    """Modelo de resposta da previsão em lote (colunar, na ordem de `itens`)"""
+
+    motos_que_sairam: List[float] = Field(..., description="Saídas previstas, uma por item")
+    motos_que_voltaram: List[float] = Field(..., description="Retornos previstos, um por item")
+    saldo_previsto: List[float] = Field(..., description="Saldo previsto, um por item")
+    model_version: Optional[str] = Field(None, description="Versão dos modelos que gerou a previsão")
+
+class ForecastScenario(BaseModel):
+    """Estado inicial de um galpão/cenário para a previsão de vários dias"""
+
+    galpao: Optional[int] = Field(
+        None,
+        description="Código numérico do galpão (0 para BUTANTAN)",
+        example=0
+    )
+    galpao_str: Optional[str] = Field(
+        None,
+        description="Nome do galpão em texto (ex: 'BUTANTAN')",
+        example="BUTANTAN"
+    )
+
+    data_inicio: Optional[date] = Field(
+        None,
+        description="Data do primeiro dia previsto. Se informada, define o dia da semana de cada passo",
+        example="2025-11-03"
+    )
+    dia_semana: Optional[int] = Field(
+        None,
+        ge=0,
+        le=6,
+        description="Dia da semana do primeiro dia previsto (usado quando `data_inicio` não é informada)",
+        example=0
+    )
+
+    motos_em_uso: float = Field(..., ge=0, description="Motos em uso no início da previsão", example=20)
+    motos_disponiveis: float = Field(..., ge=0, description="Motos disponíveis no início da previsão", example=80)
+    total_motos: float = Field(..., ge=1, description="Total de motos na frota", example=100)
+    saldo_dia: float = Field(..., description="Saldo do dia anterior ao primeiro dia previsto", example=0)
+
+    choveu: Union[int, List[int]] = Field(
+        0,
+        description="0/1 para todos os dias, ou uma lista com um valor por dia do horizonte",
+        example=[0, 0, 1, 0, 0, 0, 0]
+    )
+    feriado: Union[int, List[int]] = Field(
+        0,
+        description="0/1 para todos os dias, ou uma lista com um valor por dia do horizonte",
+        example=0
+    )
+
+
+class ForecastPayload(BaseModel):
+    """Modelo de entrada para a previsão recursiva de vários dias"""
+
+    horizonte: int = Field(
+        7,
+        ge=1,
+        le=90,
+        description="Quantidade de dias a prever",
+        example=7
+    )
+    cenarios: List[ForecastScenario] = Field(
+        ...,
+        min_length=1,
+        max_length=5000,
+        description="Estados iniciais a prever; todos avançam juntos, dia a dia"
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "horizonte": 7,
+                    "cenarios": [
+                        {
+                            "galpao_str": "BUTANTAN",
+                            "data_inicio": "2025-11-03",
+                            "motos_em_uso": 20,
+                            "motos_disponiveis": 80,
+                            "total_motos": 100,
+                            "saldo_dia": 0,
+                            "choveu": [0, 0, 1, 0, 0, 0, 0],
+                            "feriado": 0
+                        }
+                    ]
+                }
+            ]
+        }
+    }
+
+
+class ForecastStep(BaseModel):
+    """Previsão de um dia dentro do horizonte"""
+
+    passo: int = Field(..., description="Índice do dia no horizonte (1 = primeiro dia)")
+    data: Optional[date] = Field(None, description="Data prevista, quando `data_inicio` foi informada")
+    dia_semana: int = Field(..., description="Dia da semana derivado para o passo")
+    tipo_dia: int = Field(..., description="Tipo de dia derivado: 0=Dia útil, 1=Fim de semana")
+    motos_que_sairam: float = Field(..., description="Quantidade prevista de motos que sairão")
+    motos_que_voltaram: float = Field(..., description="Quantidade prevista de motos que retornarão")
+    saldo_previsto: float = Field(..., description="Saldo previsto do dia (vira o `saldo_dia` do passo seguinte)")
+    motos_em_uso: float = Field(..., description="Motos em uso ao final do dia, após aplicar o saldo")
+    motos_disponiveis: float = Field(..., description="Motos disponíveis ao final do dia, após aplicar o saldo")
+
+
+class ScenarioForecast(BaseModel):
+    """Série prevista para um cenário"""
+
+    galpao: int = Field(..., description="Código do galpão usado na previsão")
+    passos: List[ForecastStep] = Field(..., description="Previsões diárias, em ordem")
+
+
+class ForecastResponse(BaseModel):
+    """Modelo de resposta da previsão de vários dias"""
+
+    horizonte: int = Field(..., description="Quantidade de dias previstos")
+    previsoes: List[ScenarioForecast] = Field(..., description="Uma série por cenário, na ordem recebida")
+
+class RangeSpec(BaseModel):
+    """Intervalo numérico [inicio, fim] percorrido com um passo fixo"""
+
+    inicio: float = Field(..., description="Primeiro valor do intervalo", example=0)
+    fim: float = Field(..., description="Último valor do intervalo (incluído)", example=100)
+    passo: float = Field(1, gt=0, description="Incremento entre valores consecutivos", example=1)
+
+
+class SweepPayload(BaseModel):
+    """Modelo de entrada para a varredura de cenários (grade what-if)"""
+
+    galpao: Optional[int] = Field(None, description="Código numérico do galpão (0 para BUTANTAN)", example=0)
+    galpao_str: Optional[str] = Field(None, description="Nome do galpão em texto (ex: 'BUTANTAN')", example="BUTANTAN")
+    total_motos: float = Field(
+        100,
+        ge=1,
+        description="Total de motos na frota; `motos_disponiveis` = `total_motos` - `motos_em_uso`",
+        example=100
+    )
+
+    motos_em_uso: RangeSpec = Field(..., description="Intervalo de motos em uso")
+    saldo_dia: RangeSpec = Field(..., description="Intervalo de saldo do dia anterior")
+    choveu: List[int] = Field([0, 1], min_length=1, description="Valores de chuva a combinar (0/1)")
+    feriado: List[int] = Field([0, 1], min_length=1, description="Valores de feriado a combinar (0/1)")
+    dia_semana: List[int] = Field(
+        [0, 1, 2, 3, 4, 5, 6],
+        min_length=1,
+        description="Dias da semana a combinar; `tipo_dia` é derivado (sábado e domingo = fim de semana)"
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "galpao_str": "BUTANTAN",
+                    "total_motos": 100,
+                    "motos_em_uso": {"inicio": 0, "fim": 100, "passo": 5},
+                    "saldo_dia": {"inicio": -20, "fim": 20, "passo": 2},
+                    "choveu": [0, 1],
+                    "feriado": [0, 1],
+                    "dia_semana": [0, 1, 2, 3, 4, 5, 6]
+                }
+            ]
+        }
+    }
+
+
+class SweepResponse(BaseModel):
+    """Resultado da varredura, em formato colunar"""
+
+    eixos: Dict[str, List[float]] = Field(
+        ...,
+        description="Valores de cada eixo da grade, na ordem de `ordem_eixos`"
+    )
+    ordem_eixos: List[str] = Field(
+        ...,
+        description="Ordem dos eixos; os vetores de resultado estão achatados nessa ordem (row-major)"
+    )
+    pontos: int = Field(..., description="Quantidade total de combinações avaliadas")
+    motos_que_sairam: List[float] = Field(..., description="Saídas previstas, uma por combinação")
+    motos_que_voltaram: List[float] = Field(..., description="Retornos previstos, um por combinação")
+    saldo_previsto: List[float] = Field(..., description="Saldo previsto, um por combinação")
+    model_version: Optional[str] = Field(None, description="Versão dos modelos que gerou a previsão")
 
 # Variáveis globais para os modelos
 scaler = None
 model_saida = None
 model_volta = None
 metricas = None
+model_version = None
+
+@app.on_event("startup")
+def _vigiar_profiler():
+    """Cada worker acompanha a sessão do profiler compartilhada (no-op sem token)"""
+    profiler.vigiar()
 
 @app.on_event("startup")
 def _init():
     """Carrega os modelos treinados do disco ao iniciar a API"""
-    global galpao_map, scaler, model_saida, model_volta, metricas
+    global galpao_map, scaler, model_saida, model_volta, metricas, model_version
     
     try:
         # Carregar modelos salvos
         print("Carregando modelos do disco...")
-        scaler = joblib.load(MODELS_DIR / "scaler.pkl")
-        model_saida = joblib.load(MODELS_DIR / "model_saida.pkl")
-        model_volta = joblib.load(MODELS_DIR / "model_volta.pkl")
-        metricas = joblib.load(MODELS_DIR / "metricas.pkl")
-        print("Modelos carregados com sucesso!")
-        
-        # Carregar dados apenas para gerar os mapas de categoria
-        df = pd.read_csv(DATA_PATH)
+        # Resolvido uma vez: todos os arquivos vêm da mesma versão, mesmo se o retreino trocar `atual`
+        models_dir = current_models_dir(MODELS_DIR)
+        scaler = joblib.load(models_dir / "scaler.pkl")
+        model_saida = joblib.load(models_dir / "model_saida.pkl")
+        model_volta = joblib.load(models_dir / "model_volta.pkl")
+        metricas = joblib.load(models_dir / "metricas.pkl")
+        model_version = artifacts_version(models_dir)
+
+        # A matriz de entrada já vem na ordem de FEATURES (build_matrix), então o scaler
+        # recebe ndarray direto, sem montar DataFrame nem importar pandas na requisição
+        check_scaler(scaler)
+
+        if MODEL_N_JOBS:
+            model_saida.n_jobs = model_volta.n_jobs = int(MODEL_N_JOBS)
+        print(f"Modelos carregados com sucesso! Versão: {model_version}")
         
-        if df["galpao"].dtype == object:
-            df["galpao_norm"] = df["galpao"].astype(str).str.upper().str.strip()
-            cats = sorted(df["galpao_norm"].unique())
-            galpao_map = {name: i for i, name in enumerate(cats)}
+        # Mapas de categoria salvos no treino; o CSV só é lido para modelos antigos sem feature_spec.pkl
+        try:
+            galpao_map = load_spec(models_dir)["galpao_map"]
+        except FileNotFoundError:
+            import csv
+            with open(DATA_PATH, newline="") as f:
+                galpao_map = galpao_map_from(row["galpao"] for row in csv.DictReader(f))
         
         print(f"API inicializada! Galpões disponíveis: {list(galpao_map.keys())}")
         
@@ -274,6 +667,34 @@ def _init():
         print(f"ERRO ao carregar modelos: {e}")
         raise
 
+admission = AdmissionController(MAX_CONCURRENCY, MAX_QUEUE, QUEUE_TIMEOUT_MS / 1000)
+
+# Sem token, profiler.wrap devolve os endpoints intactos (custo zero)
+profiler = SamplingProfiler(enabled=bool(ADMIN_TOKEN), pasta=PROFILE_DIR)
+
+feature_store = FeatureStore(STORE_DIR, janela=STORE_JANELA)
+
+@asynccontextmanager
+async def _vaga():
+    """Vaga de inferência do controle de admissão (503 com Retry-After se não houver)"""
+    try:
+        await admission.acquire()
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"API sobrecarregada: {e.motivo}. Tente novamente em instantes.",
+            headers={"Retry-After": str(RETRY_AFTER_S)}
+        )
+    try:
+        yield
+    finally:
+        admission.release()
+
+async def _admitir():
+    """Reserva uma vaga de inferência antes de a requisição ir para o thread pool"""
+    async with _vaga():
+        yield
+
 @app.get(
     "/health",
     tags=["health"],
@@ -300,42 +721,59 @@ def health():
         "models_loaded": True,
         "galpao_map": galpao_map,
         "tipo_dia_map": tipo_dia_map,
-        "metricas": metricas if metricas else "N/A"
+        "metricas": metricas if metricas else "N/A",
+        "model_version": model_version
     }
 
-def _normalize_input(inp: InputPayload) -> pd.DataFrame:
+@app.get(
+    "/admission",
+    tags=["health"],
+    response_model=AdmissionResponse,
+    summary="Estado do controle de admissão",
+    description="""
+    Limites e contadores do controle de admissão da inferência neste worker.
     
-    if inp.galpao_str is not None:
-        key = inp.galpao_str.upper().strip()
-        g = galpao_map.get(key, 0)  
-    else:
-        g = 0 if inp.galpao is None else int(inp.galpao)
+    - `in_flight`: predições em execução
+    - `queued`: requisições aguardando vaga
+    - `rejected_queue_full` / `rejected_timeout`: recusadas com 503 por fila cheia ou prazo esgotado
+    """
+)
+def admission_stats():
+    """Fila e contadores do controle de admissão"""
+    return admission.stats()
 
-  
-    if inp.tipo_dia_str is not None:
-        key = inp.tipo_dia_str.upper().strip()
-        td = tipo_dia_map.get(key, 0)
-    else:
-        td = 0 if inp.tipo_dia is None else int(inp.tipo_dia)
-
-    row = {
-        "galpao": g,
-        "dia_semana": inp.dia_semana,
-        "motos_em_uso": inp.motos_em_uso,
-        "motos_disponiveis": inp.motos_disponiveis,
-        "choveu": inp.choveu,
-        "total_motos": inp.total_motos,
-        "feriado": inp.feriado,
-        "tipo_dia": td,
-        "saldo_dia": inp.saldo_dia,
-        "taxa_ocupacao": inp.motos_em_uso / inp.total_motos,
-        "choveu_fds": inp.choveu * td,
-        "feriado_fds": inp.feriado * td
-    }
-    return pd.DataFrame([row])[FEATURES]
+def _resolve_galpao(galpao: Optional[int], galpao_str: Optional[str]) -> int:
+    if galpao_str is not None:
+        key = galpao_str.upper().strip()
+        return galpao_map.get(key, 0)
+    return 0 if galpao is None else int(galpao)
+
+def _resolve_tipo_dia(tipo_dia: Optional[int], tipo_dia_str: Optional[str]) -> int:
+    if tipo_dia_str is not None:
+        key = tipo_dia_str.upper().strip()
+        return tipo_dia_map.get(key, 0)
+    return 0 if tipo_dia is None else int(tipo_dia)
+
+def _payload_matrix(itens: List[InputPayload]) -> np.ndarray:
+    """Converte payloads em colunas e monta a matriz de features em um único passo"""
+    return build_matrix(
+        [_resolve_galpao(i.galpao, i.galpao_str) for i in itens],
+        [i.dia_semana for i in itens],
+        [i.motos_em_uso for i in itens],
+        [i.motos_disponiveis for i in itens],
+        [i.choveu for i in itens],
+        [i.total_motos for i in itens],
+        [i.feriado for i in itens],
+        [_resolve_tipo_dia(i.tipo_dia, i.tipo_dia_str) for i in itens],
+        [i.saldo_dia for i in itens],
+    )
+
+def _normalize_input(inp: InputPayload) -> np.ndarray:
+    return _payload_matrix([inp])
 
 @app.post(
     "/predict",
+    dependencies=[Depends(_admitir)],
     tags=["prediction"],
     response_model=PredictionResponse,
     summary="Realizar previsão de demanda",
@@ -411,10 +849,11 @@ def _normalize_input(inp: InputPayload) -> pd.DataFrame:
             "description": "Erro interno durante a previsão"
         },
         503: {
-            "description": "Modelos não carregados - execute o notebook ml.ipynb primeiro"
+            "description": "Modelos não carregados ou API sobrecarregada (com cabeçalho `Retry-After`)"
         }
     }
 )
+@profiler.wrap
 def predict(inp: InputPayload):
     """Endpoint principal de previsão"""
     if model_saida is None or model_volta is None or scaler is None:
@@ -448,4 +887,616 @@ def predict(inp: InputPayload):
             } if metricas else None
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro na predição: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erro na predição: {str(e)}")
+
+
+def _predict_matrix(X: np.ndarray):
+    """Normaliza uma matriz (n, 12) na ordem de FEATURES e prevê saídas e retornos em lote"""
+    Xs = scaler.transform(X)
+    return model_saida.predict(Xs), model_volta.predict(Xs)
+
+def _per_day(value: Union[int, List[int]], horizonte: int, nome: str) -> np.ndarray:
+    """Expande um valor 0/1 (ou lista por dia) para um vetor do tamanho do horizonte"""
+    if isinstance(value, list):
+        if len(value) != horizonte:
+            raise HTTPException(
+                status_code=422,
+                detail=f"'{nome}' deve ter {horizonte} valores (um por dia), recebeu {len(value)}"
+            )
+        arr = np.asarray(value, dtype=float)
+    else:
+        arr = np.full(horizonte, float(value))
+    if ((arr != 0) & (arr != 1)).any():
+        raise HTTPException(status_code=422, detail=f"'{nome}' aceita apenas 0 ou 1")
+    return arr
+
+@app.post(
+    "/forecast",
+    dependencies=[Depends(_admitir)],
+    tags=["forecast"],
+    response_model=ForecastResponse,
+    summary="Previsão recursiva de vários dias",
+    description="""
+    Prevê `horizonte` dias seguidos a partir de um estado inicial, realimentando o
+    `saldo_previsto` de cada dia como `saldo_dia` do dia seguinte.
+    
+    **Como funciona:**
+    - `dia_semana` e `tipo_dia` são derivados a cada passo a partir de `data_inicio`
+      (ou de `dia_semana` do primeiro dia); sábado e domingo são fim de semana
+    - `motos_em_uso` e `motos_disponiveis` são atualizados com o saldo previsto,
+      limitados a `[0, total_motos]`
+    - `choveu` e `feriado` podem ser um valor único ou uma lista com um valor por dia
+    
+    Vários cenários (galpões, climas, estados iniciais) podem ser enviados de uma vez:
+    todos avançam juntos e cada dia do horizonte é previsto em um único lote.
+    """,
+    responses={
+        422: {
+            "description": "Erro de validação - parâmetros inválidos ou listas com tamanho diferente do horizonte"
+        },
+        500: {
+            "description": "Erro interno durante a previsão"
+        },
+        503: {
+            "description": "Modelos não carregados ou API sobrecarregada (com cabeçalho `Retry-After`)"
+        }
+    }
+)
+@profiler.wrap
+def forecast(payload: ForecastPayload):
+    """Previsão de vários dias, com todos os cenários avançando em conjunto"""
+    if model_saida is None or model_volta is None or scaler is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelos não carregados. Execute o notebook ml.ipynb primeiro."
+        )
+
+    cenarios = payload.cenarios
+    h = payload.horizonte
+
+    for c in cenarios:
+        if c.data_inicio is None and c.dia_semana is None:
+            raise HTTPException(
+                status_code=422,
+                detail="Informe 'data_inicio' ou 'dia_semana' em cada cenário"
+            )
+
+    galpao = np.array([_resolve_galpao(c.galpao, c.galpao_str) for c in cenarios], dtype=float)
+    dia0 = np.array([
+        c.data_inicio.weekday() if c.data_inicio is not None else c.dia_semana
+        for c in cenarios
+    ])
+    em_uso = np.array([c.motos_em_uso for c in cenarios], dtype=float)
+    disponiveis = np.array([c.motos_disponiveis for c in cenarios], dtype=float)
+    total = np.array([c.total_motos for c in cenarios], dtype=float)
+    saldo = np.array([c.saldo_dia for c in cenarios], dtype=float)
+    choveu = np.vstack([_per_day(c.choveu, h, "choveu") for c in cenarios])
+    feriado = np.vstack([_per_day(c.feriado, h, "feriado") for c in cenarios])
+
+    n = len(cenarios)
+    saidas = np.empty((n, h))
+    retornos = np.empty((n, h))
+    saldos = np.empty((n, h))
+    em_uso_hist = np.empty((n, h))
+    disponiveis_hist = np.empty((n, h))
+    dias = (dia0[:, None] + np.arange(h)[None, :]) % 7
+    tipos = tipo_dia_from_dia_semana(dias)
+    X = np.empty((n, len(FEATURES)))
+
+    try:
+        for t in range(h):
+            build_matrix(
+                galpao, dias[:, t], em_uso, disponiveis,
+                choveu[:, t], total, feriado[:, t], tipos[:, t], saldo,
+                out=X
+            )
+            saidas[:, t], retornos[:, t] = _predict_matrix(X)
+
+            # O saldo previsto vira o saldo_dia do passo seguinte
+            saldo = saidas[:, t] - retornos[:, t]
+            em_uso = np.clip(em_uso + saldo, 0, total)
+            disponiveis = np.clip(disponiveis - saldo, 0, total)
+            saldos[:, t] = saldo
+            em_uso_hist[:, t] = em_uso
+            disponiveis_hist[:, t] = disponiveis
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na previsão: {str(e)}")
+
+    previsoes = []
+    for i, c in enumerate(cenarios):
+        passos = []
+        for t in range(h):
+            passos.append({
+                "passo": t + 1,
+                "data": c.data_inicio + timedelta(days=t) if c.data_inicio is not None else None,
+                "dia_semana": int(dias[i, t]),
+                "tipo_dia": int(tipos[i, t]),
+                "motos_que_sairam": round(float(saidas[i, t]), 2),
+                "motos_que_voltaram": round(float(retornos[i, t]), 2),
+                "saldo_previsto": round(float(saldos[i, t]), 2),
+                "motos_em_uso": round(float(em_uso_hist[i, t]), 2),
+                "motos_disponiveis": round(float(disponiveis_hist[i, t]), 2),
+            })
+        previsoes.append({"galpao": int(galpao[i]), "passos": passos})
+
+    return {"horizonte": h, "previsoes": previsoes}
+
+def _range_values(r: RangeSpec, nome: str) -> np.ndarray:
+    if r.fim < r.inicio:
+        raise HTTPException(status_code=422, detail=f"'{nome}': 'fim' deve ser maior ou igual a 'inicio'")
+    n = int(np.floor((r.fim - r.inicio) / r.passo + 1e-9)) + 1
+    if n > SWEEP_MAX_PONTOS:
+        raise HTTPException(status_code=422, detail=f"'{nome}' gera valores demais ({n})")
+    return r.inicio + r.passo * np.arange(n)
+
+def _binary_values(values: List[int], nome: str) -> np.ndarray:
+    arr = np.unique(np.asarray(values, dtype=float))
+    if ((arr != 0) & (arr != 1)).any():
+        raise HTTPException(status_code=422, detail=f"'{nome}' aceita apenas 0 ou 1")
+    return arr
+
+@app.post(
+    "/sweep",
+    dependencies=[Depends(_admitir)],
+    tags=["sweep"],
+    response_model=SweepResponse,
+    summary="Varredura de cenários (grade what-if)",
+    description=f"""
+    Avalia o produto cartesiano de `dia_semana` x `choveu` x `feriado` x `motos_em_uso` x `saldo_dia`
+    em uma única chamada aos modelos.
+    
+    - `motos_em_uso` e `saldo_dia` são intervalos `{{inicio, fim, passo}}`
+    - `choveu`, `feriado` e `dia_semana` são listas de valores
+    - `motos_disponiveis` = `total_motos` - `motos_em_uso`; `tipo_dia` é derivado do dia da semana
+    - `motos_em_uso` deve ficar entre 0 e `total_motos`
+    
+    Os resultados vêm achatados na ordem de `ordem_eixos` (o último eixo varia mais rápido),
+    prontos para `reshape` em um array com uma dimensão por eixo.
+    Limite: {SWEEP_MAX_PONTOS} combinações por requisição.
+    """,
+    responses={
+        422: {
+            "description": "Erro de validação - intervalos inválidos ou grade maior que o limite"
+        },
+        500: {
+            "description": "Erro interno durante a previsão"
+        },
+        503: {
+            "description": "Modelos não carregados ou API sobrecarregada (com cabeçalho `Retry-After`)"
+        }
+    }
+)
+@profiler.wrap
+def sweep(payload: SweepPayload):
+    """Avalia a grade completa de cenários em um único lote"""
+    if model_saida is None or model_volta is None or scaler is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelos não carregados. Execute o notebook ml.ipynb primeiro."
+        )
+
+    dias = np.unique(np.asarray(payload.dia_semana, dtype=float))
+    if ((dias < 0) | (dias > 6)).any():
+        raise HTTPException(status_code=422, detail="'dia_semana' aceita valores de 0 a 6")
+
+    eixos = {
+        "dia_semana": dias,
+        "choveu": _binary_values(payload.choveu, "choveu"),
+        "feriado": _binary_values(payload.feriado, "feriado"),
+        "motos_em_uso": _range_values(payload.motos_em_uso, "motos_em_uso"),
+        "saldo_dia": _range_values(payload.saldo_dia, "saldo_dia"),
+    }
+    # Mesmas regras do InputPayload: motos_em_uso >= 0 e motos_disponiveis >= 0
+    if payload.motos_em_uso.inicio < 0 or payload.motos_em_uso.fim > payload.total_motos:
+        raise HTTPException(
+            status_code=422,
+            detail=f"'motos_em_uso' deve ficar entre 0 e total_motos ({payload.total_motos:g})"
+        )
+    pontos = int(np.prod([len(eixos[k]) for k in SWEEP_EIXOS]))
+    if pontos > SWEEP_MAX_PONTOS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"A grade tem {pontos} combinações; o limite é {SWEEP_MAX_PONTOS}"
+        )
+
+    dia, choveu, feriado, em_uso, saldo = (
+        g.ravel() for g in np.meshgrid(*(eixos[k] for k in SWEEP_EIXOS), indexing="ij")
+    )
+    total = payload.total_motos
+    galpao = _resolve_galpao(payload.galpao, payload.galpao_str)
+
+    try:
+        X = build_matrix(
+            galpao, dia, em_uso, total - em_uso,
+            choveu, total, feriado, tipo_dia_from_dia_semana(dia), saldo
+        )
+        saidas, retornos = _predict_matrix(X)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na previsão: {str(e)}")
+
+    return {
+        "eixos": {k: eixos[k].tolist() for k in SWEEP_EIXOS},
+        "ordem_eixos": SWEEP_EIXOS,
+        "pontos": pontos,
+        "motos_que_sairam": np.round(saidas, 2).tolist(),
+        "motos_que_voltaram": np.round(retornos, 2).tolist(),
+        "saldo_previsto": np.round(saidas - retornos, 2).tolist(),
+        "model_version": model_version,
+    }
+
+@app.post(
+    "/predict/batch",
+    dependencies=[Depends(_admitir)],
+    tags=["prediction"],
+    response_model=BatchPredictionResponse,
+    summary="Previsão em lote",
+    description="""
+    Mesma entrada do `/predict`, mas com uma lista de cenários em `itens`.
+    Todos os itens são avaliados em uma única chamada aos modelos e a resposta é colunar,
+    na mesma ordem de `itens`. Use este endpoint em vez de várias chamadas ao `/predict`.
+    """,
+    responses={
+        422: {
+            "description": "Erro de validação - parâmetros inválidos ou faltando"
+        },
+        500: {
+            "description": "Erro interno durante a previsão"
+        },
+        503: {
+            "description": "Modelos não carregados ou API sobrecarregada (com cabeçalho `Retry-After`)"
+        }
+    }
+)
+@profiler.wrap
+def predict_batch(payload: BatchPayload):
+    """Previsão de vários cenários em um único lote"""
+    if model_saida is None or model_volta is None or scaler is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelos não carregados. Execute o notebook ml.ipynb primeiro."
+        )
+
+    try:
+        X = _payload_matrix(payload.itens)
+        saidas, retornos = _predict_matrix(X)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na predição: {str(e)}")
+
+    return {
+        "motos_que_sairam": np.round(saidas, 2).tolist(),
+        "motos_que_voltaram": np.round(retornos, 2).tolist(),
+        "saldo_previsto": np.round(saidas - retornos, 2).tolist(),
+        "model_version": model_version,
+    }
+
+@profiler.wrap
+def _arrow_predict(arrow_batch, body: bytes) -> bytes:
+    X = arrow_batch.read_features(body, galpao_map, tipo_dia_map, max_rows=ARROW_MAX_ROWS)
+    saidas, retornos = _predict_matrix(X)
+    return arrow_batch.write_predictions(saidas, retornos, model_version)
+
+async def _read_body(request: Request, limite: int) -> bytes:
+    """Lê o corpo em pedaços, com 413 assim que passar de `limite` bytes"""
+    tamanho = request.headers.get("content-length", "")
+    if tamanho.isdigit() and int(tamanho) > limite:
+        raise HTTPException(status_code=413, detail=f"Corpo maior que o limite de {limite} bytes")
+    partes, total = [], 0
+    async for parte in request.stream():
+        total += len(parte)
+        if total > limite:
+            raise HTTPException(status_code=413, detail=f"Corpo maior que o limite de {limite} bytes")
+        partes.append(parte)
+    return b"".join(partes)
+
+@app.post(
+    "/predict/batch/arrow",
+    tags=["prediction"],
+    response_class=Response,
+    summary="Previsão em lote (Arrow IPC)",
+    description=f"""
+    Alternativa binária ao `/predict/batch` para volumes grandes. O corpo é um stream
+    Arrow IPC (`{ARROW_STREAM}`) com as colunas do `InputPayload`:
+    
+    - Obrigatórias (numéricas, sem nulos): `dia_semana`, `motos_em_uso`, `motos_disponiveis`,
+      `choveu`, `total_motos`, `feriado`, `saldo_dia`
+    - Opcionais: `galpao` / `galpao_str` e `tipo_dia` / `tipo_dia_str` (o texto tem prioridade
+      e nulos caem no código numérico, depois em 0, como no `/predict`)
+    
+    As colunas são validadas inteiras, sem criar objetos por linha. A resposta é um stream
+    Arrow com `motos_que_sairam`, `motos_que_voltaram` e `saldo_previsto`, na ordem das linhas,
+    e `model_version` nos metadados do schema. Limites: {ARROW_MAX_ROWS} linhas e
+    {ARROW_MAX_BYTES} bytes por requisição. O corpo é recebido antes de ocupar uma vaga
+    de inferência, então um upload lento não segura o controle de admissão.
+    """,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {ARROW_STREAM: {"schema": {"type": "string", "format": "binary"}}}
+        }
+    },
+    responses={
+        200: {
+            "description": "Previsões em stream Arrow IPC",
+            "content": {ARROW_STREAM: {"schema": {"type": "string", "format": "binary"}}}
+        },
+        413: {
+            "description": f"Corpo maior que {ARROW_MAX_BYTES} bytes (`MOTTU_ARROW_MAX_BYTES`)"
+        },
+        415: {
+            "description": f"Content-Type diferente de `{ARROW_STREAM}`"
+        },
+        422: {
+            "description": "Stream inválido, colunas ausentes ou valores fora das regras do InputPayload"
+        },
+        501: {
+            "description": "pyarrow não está instalado nesta imagem"
+        },
+        503: {
+            "description": "Modelos não carregados ou API sobrecarregada (com cabeçalho `Retry-After`)"
+        }
+    }
+)
+async def predict_batch_arrow(request: Request):
+    """Previsão em lote com entrada e saída em Arrow IPC"""
+    if model_saida is None or model_volta is None or scaler is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelos não carregados. Execute o notebook ml.ipynb primeiro."
+        )
+    if request.headers.get("content-type", "").split(";")[0].strip() != ARROW_STREAM:
+        raise HTTPException(status_code=415, detail=f"Use Content-Type: {ARROW_STREAM}")
+
+    # Importado só aqui: pyarrow não pesa no cold start de quem não usa este endpoint
+    try:
+        import arrow_batch
+    except ImportError:
+        raise HTTPException(status_code=501, detail="pyarrow não está instalado")
+
+    # Corpo inteiro antes da vaga: a admissão só conta o trabalho de CPU
+    body = await _read_body(request, ARROW_MAX_BYTES)
+    async with _vaga():
+        try:
+            out = await run_in_threadpool(_arrow_predict, arrow_batch, body)
+        except arrow_batch.ArrowInputError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro na predição: {str(e)}")
+
+    return Response(content=out, media_type=ARROW_STREAM)
+
+def _nome_galpao(galpao: str) -> str:
+    """Nome de galpão sem espaços nas pontas; vazio ou só espaços é rejeitado"""
+    nome = galpao.strip()
+    if not nome:
+        raise HTTPException(status_code=422, detail="'galpao_str' não pode ser vazio")
+    return nome
+
+@app.post(
+    "/store/frota",
+    tags=["store"],
+    response_model=GalpaoState,
+    summary="Registrar estado da frota de um galpão",
+    description="""
+    Atualiza as contagens atuais de um galpão (motos em uso, disponíveis e total).
+    Se `em` for informado e for anterior ao estado já registrado, o evento é ignorado.
+    Com `total_motos`, `motos_em_uso + motos_disponiveis` não pode passar dele (422).
+    """
+)
+def store_frota(evento: FleetStateEvent):
+    """Evento de estado da frota"""
+    galpao = _nome_galpao(evento.galpao_str)
+    if evento.total_motos is not None and evento.motos_em_uso + evento.motos_disponiveis > evento.total_motos:
+        raise HTTPException(
+            status_code=422,
+            detail=f"'motos_em_uso' + 'motos_disponiveis' não pode passar de total_motos ({evento.total_motos:g})"
+        )
+    return feature_store.frota(
+        galpao, evento.motos_em_uso, evento.motos_disponiveis,
+        total_motos=evento.total_motos, em=evento.em,
+    )
+
+@app.post(
+    "/store/observacao",
+    tags=["store"],
+    response_model=GalpaoState,
+    summary="Registrar o movimento observado de um dia",
+    description=f"""
+    Registra saídas e retornos de um dia. O saldo (saídas - retornos) entra na janela
+    móvel dos últimos {STORE_JANELA} dias do galpão; reenviar o mesmo dia substitui o valor.
+    """
+)
+def store_observacao(evento: ObservationEvent):
+    """Evento de observação do dia"""
+    return feature_store.observacao(
+        _nome_galpao(evento.galpao_str), evento.data, evento.motos_que_sairam, evento.motos_que_voltaram
+    )
+
+@app.get(
+    "/store",
+    tags=["store"],
+    summary="Galpões com estado no feature store"
+)
+def store_galpoes():
+    """Lista os galpões do feature store"""
+    return {"galpoes": feature_store.galpoes()}
+
+@app.get(
+    "/store/{galpao}",
+    tags=["store"],
+    response_model=GalpaoState,
+    summary="Estado de um galpão no feature store",
+    responses={404: {"description": "Galpão sem estado no feature store"}}
+)
+def store_galpao(galpao: str):
+    """Estado atual de um galpão"""
+    estado = feature_store.get(_nome_galpao(galpao))
+    if estado is None:
+        raise HTTPException(status_code=404, detail=f"Galpão '{galpao}' sem estado no feature store")
+    return estado
+
+@app.post(
+    "/predict/galpao",
+    dependencies=[Depends(_admitir)],
+    tags=["prediction"],
+    response_model=GalpaoPredictionResponse,
+    summary="Previsão leve por galpão e data",
+    description="""
+    Prevê um dia informando só o galpão, a data e as condições de chuva e feriado.
+    As demais features vêm do feature store (`/store/frota` e `/store/observacao`):
+    
+    - `motos_em_uso`, `motos_disponiveis`, `total_motos`: último estado da frota
+    - `saldo_dia`: saldo observado mais recente antes da data (0 se não houver)
+    - `dia_semana` e `tipo_dia`: derivados da data
+    
+    A consulta ao estado do galpão é O(1). O galpão precisa existir nos modelos
+    (`galpao_map` do `/health`); galpões desconhecidos recebem 404.
+    """,
+    responses={
+        404: {"description": "Galpão desconhecido pelos modelos ou sem estado no feature store"},
+        409: {"description": "Galpão sem estado da frota registrado"},
+        503: {"description": "Modelos não carregados ou API sobrecarregada (com cabeçalho `Retry-After`)"}
+    }
+)
+@profiler.wrap
+def predict_galpao(payload: GalpaoPredictPayload):
+    """Previsão com features do feature store"""
+    if model_saida is None or model_volta is None or scaler is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelos não carregados. Execute o notebook ml.ipynb primeiro."
+        )
+
+    galpao = _nome_galpao(payload.galpao_str)
+    if galpao.upper() not in galpao_map:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Galpão '{galpao}' não existe nos modelos; conhecidos: {sorted(galpao_map)}"
+        )
+    estado = feature_store.get(galpao)
+    if estado is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Galpão '{payload.galpao_str}' sem estado no feature store"
+        )
+    if estado["total_motos"] is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Galpão '{estado['galpao']}' sem estado da frota; envie POST /store/frota"
+        )
+
+    try:
+        saldo, saldo_de = feature_store.saldo_anterior(estado, payload.data)
+        dia_semana = payload.data.weekday()
+        tipo_dia = int(tipo_dia_from_dia_semana(dia_semana))
+        X = build_matrix(
+            galpao_map[estado["galpao"]], dia_semana, estado["motos_em_uso"],
+            estado["motos_disponiveis"], payload.choveu, estado["total_motos"],
+            payload.feriado, tipo_dia, saldo,
+        )
+        saidas, retornos = _predict_matrix(X)
+
+        return {
+            "galpao": estado["galpao"],
+            "data": payload.data,
+            "motos_que_sairam": round(float(saidas[0]), 2),
+            "motos_que_voltaram": round(float(retornos[0]), 2),
+            "saldo_previsto": round(float(saidas[0] - retornos[0]), 2),
+            "features": {
+                "dia_semana": dia_semana,
+                "motos_em_uso": estado["motos_em_uso"],
+                "motos_disponiveis": estado["motos_disponiveis"],
+                "choveu": payload.choveu,
+                "total_motos": estado["total_motos"],
+                "feriado": payload.feriado,
+                "tipo_dia": tipo_dia,
+                "saldo_dia": saldo,
+            },
+            "saldo_de": saldo_de,
+            "frota_em": estado["frota_em"],
+            "model_version": model_version,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na predição: {str(e)}")
+
+def _admin(x_admin_token: Optional[str] = Header(None)):
+    """Valida o token de administração; sem MOTTU_ADMIN_TOKEN os endpoints não existem"""
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="X-Admin-Token inválido")
+
+def _profile_status() -> Dict[str, Any]:
+    return {**profiler.stats(), "top": profiler.top()}
+
+@app.post(
+    "/admin/profile",
+    dependencies=[Depends(_admin)],
+    tags=["admin"],
+    response_model=ProfileResponse,
+    include_in_schema=profiler.enabled,
+    summary="Iniciar sessão do profiler",
+    description="""
+    Inicia uma sessão de profiling por amostragem em todos os workers. Durante `duracao_s`
+    segundos, uma fração `amostra` das requisições de inferência (`/predict`,
+    `/predict/galpao`, `/predict/batch`, `/predict/batch/arrow`, `/forecast`, `/sweep`) tem a pilha
+    lida a cada `intervalo_ms`. As pilhas são agregadas entre as requisições.
+    
+    A sessão fica em `MOTTU_PROFILE_DIR`: os demais workers entram nela em até 0,5 s e
+    cada um publica as suas pilhas a cada segundo. As consultas somam os perfis de todos
+    os workers, qualquer que seja o worker que as atende (campos `pid` e `workers`).
+    
+    Responde 409 se já houver uma sessão ativa (encerre com `DELETE /admin/profile`).
+    """
+)
+def profile_start(payload: ProfileStartPayload):
+    """Inicia o profiler por amostragem"""
+    if profiler.sessao_ativa():
+        raise HTTPException(status_code=409, detail="Já existe uma sessão do profiler ativa")
+    profiler.start(
+        duracao=payload.duracao_s,
+        amostra=payload.amostra,
+        intervalo=payload.intervalo_ms / 1000,
+        todas_threads=payload.todas_threads,
+    )
+    return _profile_status()
+
+@app.get(
+    "/admin/profile",
+    dependencies=[Depends(_admin)],
+    tags=["admin"],
+    response_model=ProfileResponse,
+    include_in_schema=profiler.enabled,
+    summary="Estado e frames mais custosos do profiler"
+)
+def profile_status():
+    """Estado da sessão e resumo por frame"""
+    return _profile_status()
+
+@app.get(
+    "/admin/profile/collapsed",
+    dependencies=[Depends(_admin)],
+    tags=["admin"],
+    response_class=PlainTextResponse,
+    include_in_schema=profiler.enabled,
+    summary="Pilhas agregadas (collapsed stacks)",
+    description="""
+    Uma linha por pilha distinta, no formato `raiz;...;folha contagem`, com frames
+    `módulo:função`. Pode ser lido diretamente por `flamegraph.pl`, speedscope ou inferno.
+    """
+)
+def profile_collapsed():
+    """Perfil no formato collapsed (pronto para flamegraph)"""
+    return profiler.collapsed()
+
+@app.delete(
+    "/admin/profile",
+    dependencies=[Depends(_admin)],
+    tags=["admin"],
+    response_model=ProfileResponse,
+    include_in_schema=profiler.enabled,
+    summary="Encerrar sessão do profiler"
+)
+def profile_stop():
+    """Encerra a sessão; o perfil coletado continua disponível até a próxima"""
+    profiler.stop()
+    return _profile_status()
@@ -0,0 +1,157 @@
+"""Entrada e saída em Arrow IPC (stream) para a previsão em lote.
+
+Recebe as colunas do `InputPayload` como um record batch e monta a matriz de
+features coluna a coluna, sem criar um objeto Python por linha. A validação
+segue as mesmas regras do `InputPayload`, mas aplicada a colunas inteiras.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+from feature_engineering import build_matrix, encode_labels
+
+# coluna -> (mínimo, máximo, precisa ser inteiro)
+REQUIRED = {
+    "dia_semana": (0, 6, True),
+    "motos_em_uso": (0, None, False),
+    "motos_disponiveis": (0, None, False),
+    "choveu": (0, 1, True),
+    "total_motos": (1, None, False),
+    "feriado": (0, 1, True),
+    "saldo_dia": (None, None, False),
+}
+
+
+class ArrowInputError(ValueError):
+    """Stream Arrow inválido ou colunas fora das regras do InputPayload"""
+
+
+def _numeric(table: pa.Table, name: str, nullable: bool = False) -> Optional[np.ndarray]:
+    if name not in table.column_names:
+        return None
+    col = table.column(name)
+    if not (pa.types.is_integer(col.type) or pa.types.is_floating(col.type) or pa.types.is_boolean(col.type)):
+        raise ArrowInputError(f"'{name}' deve ser numérica, recebeu {col.type}")
+    if col.null_count and not nullable:
+        raise ArrowInputError(f"'{name}' tem {col.null_count} valores nulos")
+    col = pc.cast(col, pa.float64())
+    if nullable:
+        col = pc.fill_null(col, np.nan)
+    return col.to_numpy()
+
+
+def _check_range(name: str, values: np.ndarray, lo, hi, integer: bool) -> None:
+    bad = ~np.isfinite(values)
+    if lo is not None:
+        bad |= values < lo
+    if hi is not None:
+        bad |= values > hi
+    if integer:
+        bad |= values != np.floor(values)
+    if bad.any():
+        i = int(np.argmax(bad))
+        regra = f"entre {lo} e {hi}" if hi is not None else (f">= {lo}" if lo is not None else "finito")
+        raise ArrowInputError(
+            f"'{name}' tem {int(bad.sum())} valores inválidos (deve ser {regra}"
+            f"{', inteiro' if integer else ''}); primeira linha: {i}"
+        )
+
+
+def _labels(table: pa.Table, name: str, mapping: Dict[str, int]):
+    """Codifica uma coluna de texto pelo dicionário; devolve (códigos, máscara de presentes)"""
+    if name not in table.column_names:
+        return None, None
+    col = table.column(name)
+    if not (pa.types.is_string(col.type) or pa.types.is_large_string(col.type)
+            or pa.types.is_dictionary(col.type)):
+        raise ArrowInputError(f"'{name}' deve ser texto, recebeu {col.type}")
+    arr = col.combine_chunks()
+    if not pa.types.is_dictionary(arr.type):
+        arr = arr.dictionary_encode()
+    present = arr.is_valid().to_numpy(zero_copy_only=False)
+    if len(arr.dictionary) == 0:
+        return np.zeros(len(arr)), present
+    # Só os valores distintos passam pelo mapa; as linhas usam os índices
+    codes = encode_labels(arr.dictionary.to_numpy(zero_copy_only=False), mapping)
+    return codes[arr.indices.fill_null(0).to_numpy()], present
+
+
+def _resolve(table: pa.Table, name: str, mapping: Dict[str, int], hi=None) -> np.ndarray:
+    """`<name>_str` tem prioridade; depois o código `<name>`; senão 0 (mesma regra do /predict)"""
+    out = np.zeros(table.num_rows)
+    numeric = _numeric(table, name, nullable=True)
+    if numeric is not None:
+        has = ~np.isnan(numeric)
+        _check_range(name, numeric[has], 0, hi, True)
+        out = np.where(has, numeric, out)
+    codes, present = _labels(table, f"{name}_str", mapping)
+    if codes is not None:
+        out = np.where(present, codes, out)
+    return out
+
+
+def read_features(
+    body: bytes,
+    galpao_map: Dict[str, int],
+    tipo_dia_map: Dict[str, int],
+    max_rows: Optional[int] = None,
+) -> np.ndarray:
+    """Lê um stream Arrow IPC e devolve a matriz (n, 12) na ordem de FEATURES.
+
+    Os batches são visões sobre `body` (sem cópia); o limite de `max_rows` é conferido
+    batch a batch, antes de qualquer conversão de coluna ou da matriz de features.
+    """
+    batches, linhas = [], 0
+    try:
+        reader = ipc.open_stream(pa.py_buffer(body))
+        for batch in reader:
+            linhas += batch.num_rows
+            if max_rows is not None and linhas > max_rows:
+                raise ArrowInputError(f"O lote tem mais de {max_rows} linhas (limite por requisição)")
+            batches.append(batch)
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ArrowInputError(f"Corpo não é um stream Arrow IPC válido: {e}") from None
+
+    faltando = [c for c in REQUIRED if c not in table.column_names]
+    if faltando:
+        raise ArrowInputError(f"Colunas obrigatórias ausentes: {faltando}")
+    if table.num_rows == 0:
+        raise ArrowInputError("O stream não tem linhas")
+
+    cols = {}
+    for name, (lo, hi, integer) in REQUIRED.items():
+        cols[name] = _numeric(table, name)
+        _check_range(name, cols[name], lo, hi, integer)
+
+    return build_matrix(
+        _resolve(table, "galpao", galpao_map), cols["dia_semana"], cols["motos_em_uso"],
+        cols["motos_disponiveis"], cols["choveu"], cols["total_motos"], cols["feriado"],
+        _resolve(table, "tipo_dia", tipo_dia_map, hi=1), cols["saldo_dia"],
+    )
+
+
+def write_predictions(saidas: np.ndarray, retornos: np.ndarray, model_version: Optional[str]) -> bytes:
+    """Serializa as previsões como um record batch em stream Arrow IPC"""
+    batch = pa.record_batch(
+        [
+            pa.array(np.round(saidas, 2)),
+            pa.array(np.round(retornos, 2)),
+            pa.array(np.round(saidas - retornos, 2)),
+        ],
+        schema=pa.schema(
+            [
+                ("motos_que_sairam", pa.float64()),
+                ("motos_que_voltaram", pa.float64()),
+                ("saldo_previsto", pa.float64()),
+            ],
+            metadata={"model_version": model_version or ""},
+        ),
+    )
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
@@ -1,8 +1,15 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import joblib
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
+
+from feature_engineering import (
+    FEATURES, artifacts_version, build_matrix, check_scaler, current_models_dir, load_spec, tipo_dia_from_dia_semana
+)
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime
@@ -57,9 +64,46 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Modo API: com MOTTU_API_URL definido, o dashboard usa a API (mesma versão de modelo)
+# e só carrega os pickles localmente se a API estiver indisponível.
+API_URL = os.environ.get("MOTTU_API_URL", "").rstrip("/")
+API_CONNECT_TIMEOUT = float(os.environ.get("MOTTU_API_CONNECT_TIMEOUT", "2"))
+API_TIMEOUT = float(os.environ.get("MOTTU_API_TIMEOUT", "15"))
+API_CACHE_TTL = int(os.environ.get("MOTTU_API_CACHE_TTL", "30"))
+# Mesmo limite de combinações por requisição do /sweep (SWEEP_MAX_PONTOS na API)
+SWEEP_MAX_PONTOS = 200_000
+
+@st.cache_resource
+def get_api_session():
+    """Sessão HTTP única para todas as execuções do script (conexões keep-alive reaproveitadas)"""
+    session = requests.Session()
+    retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2, allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def api_request(method, path, payload=None):
+    resp = get_api_session().request(
+        method,
+        f"{API_URL}{path}",
+        json=payload,
+        timeout=(API_CONNECT_TIMEOUT, API_TIMEOUT)
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
+def api_health():
+    return api_request("GET", "/health")
+
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
+def api_predict(payload):
+    return api_request("POST", "/predict", payload)
+
 @st.cache_resource
 def load_models():
-    models_dir = Path('models')
+    models_dir = current_models_dir(Path('models'))
     
     try:
         model_saida = joblib.load(models_dir / 'model_saida.pkl')
@@ -67,19 +111,137 @@ def load_models():
         scaler = joblib.load(models_dir / 'scaler.pkl')
         features = joblib.load(models_dir / 'features.pkl')
         metricas = joblib.load(models_dir / 'metricas.pkl')
+        if list(features) != FEATURES:
+            raise ValueError(f"features.pkl difere de FEATURES: {features}")
+        check_scaler(scaler)
+        try:
+            galpao_map = load_spec(models_dir)['galpao_map']
+        except FileNotFoundError:
+            galpao_map = {}
         
-        return model_saida, model_volta, scaler, features, metricas
+        model_version = artifacts_version(models_dir)
+        
+        return model_saida, model_volta, scaler, features, metricas, galpao_map, model_version
     except Exception as e:
         st.error(f"Erro ao carregar modelos: {e}")
         st.info("Execute o notebook ml.ipynb primeiro para treinar e salvar os modelos!")
         st.stop()
 
-model_saida, model_volta, scaler, features, metricas = load_models()
+def avisar_fallback(e):
+    st.sidebar.warning(f"API indisponível ({e.__class__.__name__}); usando modelos locais.")
+
+def resolve_backend():
+    if API_URL:
+        try:
+            return "api", api_health()
+        except requests.RequestException as e:
+            avisar_fallback(e)
+    return "local", None
+
+backend, api_info = resolve_backend()
+
+if backend == "api":
+    model_saida = model_volta = scaler = features = None
+    metricas = api_info.get("metricas")
+    galpao_map = api_info.get("galpao_map") or {}
+    model_version = api_info.get("model_version") or "api"
+else:
+    model_saida, model_volta, scaler, features, metricas, galpao_map, model_version = load_models()
+
+if not galpao_map:
+    galpao_map = {"BUTANTAN": 0}
+
+def predict_matrix(X):
+    # Modelos locais carregados sob demanda: no modo API só são usados se a API cair
+    model_saida, model_volta, scaler = load_models()[:3]
+    Xs = scaler.transform(X)
+    return model_saida.predict(Xs), model_volta.predict(Xs)
+
+def predict_one(row):
+    """Prevê saídas e retornos para um cenário, via API ou com os modelos locais"""
+    if backend == "api":
+        try:
+            resp = api_predict(row)
+            return resp['motos_que_sairam'], resp['motos_que_voltaram']
+        except requests.RequestException as e:
+            avisar_fallback(e)
+    
+    X = build_matrix(
+        row['galpao'], row['dia_semana'], row['motos_em_uso'], row['motos_disponiveis'],
+        row['choveu'], row['total_motos'], row['feriado'], row['tipo_dia'], row['saldo_dia']
+    )
+    saidas, voltas = predict_matrix(X)
+    return saidas[0], voltas[0]
+
+DIAS_SEMANA = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def score_grid(model_version, grid_spec, usar_api):
+    """Avalia o produto cartesiano da grade em uma única chamada aos modelos.
+
+    O cache é indexado pela versão do modelo, pela especificação da grade e pelo
+    backend, então trocar os pickles invalida os resultados anteriores.
+    """
+    total_motos, em_uso_range, saldo_range, dias, chuvas, feriados, galpao = grid_spec
+    em_uso_vals = np.arange(em_uso_range[0], em_uso_range[1] + 1, em_uso_range[2], dtype=float)
+    saldo_vals = np.arange(saldo_range[0], saldo_range[1] + 1, saldo_range[2], dtype=float)
+    eixos = (
+        np.asarray(dias, dtype=float),
+        np.asarray(chuvas, dtype=float),
+        np.asarray(feriados, dtype=float),
+        em_uso_vals,
+        saldo_vals,
+    )
+    shape = tuple(len(e) for e in eixos)
+    
+    if usar_api:
+        # Mesma grade avaliada pelo /sweep, em lotes de dias da semana que respeitam
+        # o limite de combinações por requisição (o dia é o eixo mais externo)
+        por_dia = int(np.prod(shape[1:]))
+        dias_por_lote = max(1, SWEEP_MAX_PONTOS // por_dia)
+        partes_saida, partes_volta = [], []
+        for i in range(0, len(dias), dias_por_lote):
+            resp = api_request("POST", "/sweep", {
+                "galpao": galpao,
+                "total_motos": total_motos,
+                "motos_em_uso": dict(zip(("inicio", "fim", "passo"), em_uso_range)),
+                "saldo_dia": dict(zip(("inicio", "fim", "passo"), saldo_range)),
+                "dia_semana": list(dias[i:i + dias_por_lote]),
+                "choveu": list(chuvas),
+                "feriado": list(feriados),
+            })
+            partes_saida.append(resp['motos_que_sairam'])
+            partes_volta.append(resp['motos_que_voltaram'])
+        saidas = np.concatenate(partes_saida)
+        voltas = np.concatenate(partes_volta)
+        return {
+            'em_uso': em_uso_vals,
+            'saldo_dia': saldo_vals,
+            'saida': saidas.reshape(shape),
+            'volta': voltas.reshape(shape),
+            'saldo': (saidas - voltas).reshape(shape),
+        }
+    
+    dia, choveu, feriado, em_uso, saldo = (g.ravel() for g in np.meshgrid(*eixos, indexing='ij'))
+    
+    X = build_matrix(
+        galpao, dia, em_uso, total_motos - em_uso,
+        choveu, total_motos, feriado, tipo_dia_from_dia_semana(dia), saldo
+    )
+    saidas, voltas = predict_matrix(X)
+    
+    return {
+        'em_uso': em_uso_vals,
+        'saldo_dia': saldo_vals,
+        'saida': saidas.reshape(shape),
+        'volta': voltas.reshape(shape),
+        'saldo': (saidas - voltas).reshape(shape),
+    }
 
 st.markdown('<p class="main-header">Sistema de Previsão de Demanda - Mottu</p>', unsafe_allow_html=True)
 st.markdown('<p class="sub-header">Previsão de saídas e retornos de motocicletas</p>', unsafe_allow_html=True)
 
-tab1, tab2, tab3 = st.tabs(["Previsão", "Métricas do Modelo", "Sobre"])
+tab1, tab_cenarios, tab2, tab3 = st.tabs(["Previsão", "Cenários", "Métricas do Modelo", "Sobre"])
 
 with tab1:
     st.markdown("### Fazer Previsão")
@@ -87,6 +249,9 @@ with tab1:
     st.sidebar.markdown("## Parâmetros de Entrada")
     st.sidebar.markdown("---")
     
+    galpao_nome = st.sidebar.selectbox("Galpão", options=list(galpao_map.keys()))
+    galpao = galpao_map[galpao_nome]
+    
     col_sidebar1, col_sidebar2 = st.sidebar.columns(2)
     
     with col_sidebar1:
@@ -154,21 +319,17 @@ with tab1:
     
     with col1:
         if predict_button:
-            galpao = 0
-            taxa_ocupacao = motos_em_uso / total_motos
-            choveu_fds = choveu * tipo_dia
-            feriado_fds = feriado * tipo_dia
-            
-            input_data = pd.DataFrame([[
-                galpao, dia_semana, motos_em_uso, motos_disponiveis,
-                choveu, total_motos, feriado, tipo_dia, saldo_dia,
-                taxa_ocupacao, choveu_fds, feriado_fds
-            ]], columns=features)
-            
-            input_scaled = scaler.transform(input_data)
-            
-            pred_saida = model_saida.predict(input_scaled)[0]
-            pred_volta = model_volta.predict(input_scaled)[0]
+            pred_saida, pred_volta = predict_one({
+                'galpao': galpao,
+                'dia_semana': dia_semana,
+                'motos_em_uso': motos_em_uso,
+                'motos_disponiveis': motos_disponiveis,
+                'choveu': choveu,
+                'total_motos': total_motos,
+                'feriado': feriado,
+                'tipo_dia': tipo_dia,
+                'saldo_dia': saldo_dia
+            })
             saldo_previsto = pred_saida - pred_volta
             
             st.session_state['ultima_predicao'] = {
@@ -297,6 +458,122 @@ with tab1:
             
             st.plotly_chart(fig_pizza, use_container_width=True)
 
+with tab_cenarios:
+    st.markdown("### Varredura de Cenários")
+    st.markdown("Escolha os intervalos; todas as combinações são avaliadas de uma vez e exibidas como mapas de calor.")
+    
+    grid_col1, grid_col2, grid_col3 = st.columns(3)
+    
+    with grid_col1:
+        grid_total = st.number_input("Total de Motos", min_value=1, max_value=200, value=100, step=1, key="grid_total")
+        grid_em_uso = st.slider("Motos em Uso", min_value=0, max_value=int(grid_total), value=(0, int(grid_total)), key="grid_em_uso")
+        grid_em_uso_passo = st.number_input("Passo (Motos em Uso)", min_value=1, max_value=50, value=1, step=1)
+    
+    with grid_col2:
+        grid_saldo = st.slider("Saldo do Dia Anterior", min_value=-50, max_value=50, value=(-25, 25), key="grid_saldo")
+        grid_saldo_passo = st.number_input("Passo (Saldo)", min_value=1, max_value=25, value=1, step=1)
+    
+    with grid_col3:
+        grid_dias = st.multiselect(
+            "Dias da Semana",
+            options=list(range(7)),
+            default=list(range(7)),
+            format_func=lambda x: DIAS_SEMANA[x]
+        )
+        grid_chuva = st.multiselect(
+            "Condição Climática",
+            options=[0, 1],
+            default=[0, 1],
+            format_func=lambda x: "Sem Chuva" if x == 0 else "Com Chuva"
+        )
+        grid_feriado = st.multiselect(
+            "Feriado",
+            options=[0, 1],
+            default=[0, 1],
+            format_func=lambda x: "Não" if x == 0 else "Sim"
+        )
+    
+    n_em_uso = (grid_em_uso[1] - grid_em_uso[0]) // grid_em_uso_passo + 1
+    n_saldo = (grid_saldo[1] - grid_saldo[0]) // grid_saldo_passo + 1
+    n_pontos = n_em_uso * n_saldo * len(grid_dias) * len(grid_chuva) * len(grid_feriado)
+    st.caption(f"{n_pontos:,} combinações · galpão {galpao_nome} · modelo {model_version}".replace(",", "."))
+    
+    if not (grid_dias and grid_chuva and grid_feriado):
+        st.warning("Selecione ao menos um valor para dia da semana, clima e feriado.")
+    else:
+        grid_spec = (
+            int(grid_total),
+            (int(grid_em_uso[0]), int(grid_em_uso[1]), int(grid_em_uso_passo)),
+            (int(grid_saldo[0]), int(grid_saldo[1]), int(grid_saldo_passo)),
+            tuple(sorted(grid_dias)),
+            tuple(sorted(grid_chuva)),
+            tuple(sorted(grid_feriado)),
+            galpao,
+        )
+        with st.spinner("Avaliando cenários..."):
+            try:
+                grade = score_grid(model_version, grid_spec, backend == "api")
+            except requests.RequestException as e:
+                avisar_fallback(e)
+                grade = score_grid(load_models()[-1], grid_spec, False)
+        
+        alvo = st.radio(
+            "Variável",
+            options=['saldo', 'saida', 'volta'],
+            format_func=lambda x: {'saldo': 'Saldo Previsto', 'saida': 'Saídas', 'volta': 'Retornos'}[x],
+            horizontal=True
+        )
+        
+        sel_col1, sel_col2, sel_col3 = st.columns(3)
+        dias_ord, chuva_ord, feriado_ord = grid_spec[3], grid_spec[4], grid_spec[5]
+        with sel_col1:
+            dia_sel = st.selectbox("Dia exibido", options=dias_ord, format_func=lambda x: DIAS_SEMANA[x])
+        with sel_col2:
+            chuva_sel = st.selectbox("Clima exibido", options=chuva_ord, format_func=lambda x: "Sem Chuva" if x == 0 else "Com Chuva")
+        with sel_col3:
+            feriado_sel = st.selectbox("Feriado exibido", options=feriado_ord, format_func=lambda x: "Não" if x == 0 else "Sim")
+        
+        valores = grade[alvo]
+        fatia = valores[dias_ord.index(dia_sel), chuva_ord.index(chuva_sel), feriado_ord.index(feriado_sel)]
+        escala = 'RdBu_r' if alvo == 'saldo' else 'YlOrBr'
+        
+        fig_grid = go.Figure(data=go.Heatmap(
+            z=fatia.T,
+            x=grade['em_uso'],
+            y=grade['saldo_dia'],
+            colorscale=escala,
+            zmid=0 if alvo == 'saldo' else None,
+            colorbar=dict(title="Motos")
+        ))
+        fig_grid.update_layout(
+            title=f"{DIAS_SEMANA[dia_sel]} · {'Com' if chuva_sel else 'Sem'} Chuva · {'Feriado' if feriado_sel else 'Sem Feriado'}",
+            xaxis_title="Motos em Uso",
+            yaxis_title="Saldo do Dia Anterior",
+            template="plotly_white",
+            height=450,
+            paper_bgcolor='#f5ebe0'
+        )
+        st.plotly_chart(fig_grid, use_container_width=True)
+        
+        # Média sobre clima, feriado e saldo: efeito do dia da semana por ocupação
+        media_dia = valores.mean(axis=(1, 2, 4))
+        fig_dias = go.Figure(data=go.Heatmap(
+            z=media_dia,
+            x=grade['em_uso'],
+            y=[DIAS_SEMANA[d] for d in dias_ord],
+            colorscale=escala,
+            zmid=0 if alvo == 'saldo' else None,
+            colorbar=dict(title="Motos")
+        ))
+        fig_dias.update_layout(
+            title="Média por Dia da Semana (sobre clima, feriado e saldo anterior)",
+            xaxis_title="Motos em Uso",
+            template="plotly_white",
+            height=350,
+            paper_bgcolor='#f5ebe0'
+        )
+        st.plotly_chart(fig_dias, use_container_width=True)
+
 with tab2:
     st.markdown("### Performance dos Modelos")
     
@@ -433,4 +710,5 @@ st.sidebar.markdown("""
     <p>v1.0.0</p>
 </div>
 """, unsafe_allow_html=True)
+st.sidebar.caption(f"Modelo {model_version} · {'API' if backend == 'api' else 'local'}")
 
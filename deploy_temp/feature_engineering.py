@@ -0,0 +1,225 @@
+"""Feature engineering compartilhado entre notebook (treino), API e dashboard.
+
+Todas as funções trabalham com colunas (arrays ou escalares, com broadcasting),
+então o mesmo código atende 1 linha ou milhões de linhas. A especificação
+(ordem das features e codificações) é salva em `models/feature_spec.pkl` junto
+com os modelos e conferida ao carregar, para que a inferência não divirja do treino.
+"""
+import hashlib
+import inspect
+import warnings
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import joblib
+
+SPEC_VERSION = 1
+SPEC_FILE = "feature_spec.pkl"
+# Symlink para a versão publicada em `versoes/` (criado pelo retreino incremental)
+CURRENT_LINK = "atual"
+
+FEATURES = [
+    "galpao", "dia_semana", "motos_em_uso", "motos_disponiveis",
+    "choveu", "total_motos", "feriado", "tipo_dia", "saldo_dia",
+    "taxa_ocupacao", "choveu_fds", "feriado_fds"
+]
+
+TIPO_DIA_MAP = {"UTIL": 0, "FIM_DE_SEMANA": 1}
+
+_BLOCK_ROWS = 4096
+
+
+def _normalize_labels(values) -> np.ndarray:
+    """Texto em maiúsculas e sem espaços nas pontas, elemento a elemento"""
+    return np.char.upper(np.char.strip(np.asarray(values, dtype=str)))
+
+
+def galpao_map_from(values: Iterable) -> Dict[str, int]:
+    """Mapa galpão -> código, em ordem alfabética (mesma ordem de `astype('category').cat.codes`)"""
+    return {name: i for i, name in enumerate(sorted(set(_normalize_labels(list(values)).tolist())))}
+
+
+def extend_galpao_map(galpao_map: Dict[str, int], values: Iterable) -> Dict[str, int]:
+    """Acrescenta galpões novos com os próximos códigos, sem mudar os já existentes.
+
+    Usado no retreino incremental: as árvores já treinadas dependem dos códigos antigos.
+    """
+    out = dict(galpao_map)
+    for name in sorted(set(_normalize_labels(list(values)).tolist()) - out.keys()):
+        out[name] = max(out.values(), default=-1) + 1
+    return out
+
+
+def encode_labels(values, mapping: Dict[str, int], default: int = 0) -> np.ndarray:
+    """Codifica uma coluna de texto com `mapping`; valores desconhecidos viram `default`"""
+    labels = _normalize_labels(values)
+    uniques, inverse = np.unique(labels, return_inverse=True)
+    codes = np.array([mapping.get(u, default) for u in uniques.tolist()], dtype=np.float64)
+    return codes[inverse].reshape(labels.shape)
+
+
+def tipo_dia_from_dia_semana(dia_semana) -> np.ndarray:
+    """0 = dia útil, 1 = fim de semana (sábado e domingo)"""
+    return (np.asarray(dia_semana) >= 5).astype(np.float64)
+
+
+def build_matrix(
+    galpao,
+    dia_semana,
+    motos_em_uso,
+    motos_disponiveis,
+    choveu,
+    total_motos,
+    feriado,
+    tipo_dia,
+    saldo_dia,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Monta a matriz (n, 12) float64 C-contígua na ordem de FEATURES.
+
+    Cada argumento é uma coluna numérica já codificada ou um escalar (broadcast).
+    `out` permite reaproveitar um buffer já alocado com o mesmo formato.
+    """
+    cols = [np.asarray(c, dtype=np.float64) for c in (
+        galpao, dia_semana, motos_em_uso, motos_disponiveis,
+        choveu, total_motos, feriado, tipo_dia, saldo_dia
+    )]
+    n = int(np.prod(np.broadcast_shapes(*(c.shape for c in cols)), dtype=np.int64))
+    if out is None:
+        out = np.empty((n, len(FEATURES)), dtype=np.float64)
+    elif out.shape != (n, len(FEATURES)) or out.dtype != np.float64 or not out.flags.c_contiguous:
+        raise ValueError(f"'out' deve ser float64 C-contíguo com formato {(n, len(FEATURES))}")
+
+    cols = [c.reshape(-1) if c.size == n else c for c in cols]
+    # Preenche em blocos de linhas: cada coluna é escrita com passo de 12 valores,
+    # e blocos pequenos mantêm esse trecho da matriz no cache.
+    for start in range(0, n, _BLOCK_ROWS):
+        stop = min(start + _BLOCK_ROWS, n)
+        blk = out[start:stop]
+        for j, c in enumerate(cols):
+            blk[:, j] = c[start:stop] if c.size == n else c
+        np.divide(blk[:, 2], blk[:, 5], out=blk[:, 9])
+        np.multiply(blk[:, 4], blk[:, 7], out=blk[:, 10])
+        np.multiply(blk[:, 6], blk[:, 7], out=blk[:, 11])
+    return out
+
+
+def build_frame_matrix(df, galpao_map: Dict[str, int]) -> np.ndarray:
+    """Matriz de features a partir do CSV bruto (galpão e tipo_dia em texto).
+
+    `df` pode ser um DataFrame ou um dict de colunas (arrays).
+    """
+    return build_matrix(
+        encode_labels(np.asarray(df["galpao"]), galpao_map),
+        np.asarray(df["dia_semana"]),
+        np.asarray(df["motos_em_uso"]),
+        np.asarray(df["motos_disponiveis"]),
+        np.asarray(df["choveu"]),
+        np.asarray(df["total_motos"]),
+        np.asarray(df["feriado"]),
+        encode_labels(np.asarray(df["tipo_dia"]), TIPO_DIA_MAP),
+        np.asarray(df["saldo_dia"]),
+    )
+
+
+def _transform_fingerprint() -> str:
+    """Hash do código que transforma as colunas em features (sem linhas vazias e comentários).
+
+    Vai para o spec no treino e é conferido ao carregar: mudar a lógica de
+    `build_matrix` ou das codificações sem retreinar falha em vez de servir com skew.
+    """
+    h = hashlib.sha1()
+    for fn in (_normalize_labels, encode_labels, tipo_dia_from_dia_semana, build_matrix, build_frame_matrix):
+        linhas = (linha.strip() for linha in inspect.getsource(fn).splitlines())
+        h.update("\n".join(linha for linha in linhas if linha and not linha.startswith("#")).encode())
+    return h.hexdigest()[:12]
+
+
+TRANSFORM_FINGERPRINT = _transform_fingerprint()
+
+
+def make_spec(galpao_map: Dict[str, int]) -> Dict:
+    """Especificação persistida junto com os modelos"""
+    return {
+        "version": SPEC_VERSION,
+        "transform": TRANSFORM_FINGERPRINT,
+        "features": list(FEATURES),
+        "tipo_dia_map": dict(TIPO_DIA_MAP),
+        "galpao_map": dict(galpao_map),
+    }
+
+
+def check_spec(spec: Dict) -> None:
+    """Falha se os modelos foram treinados com outra versão do feature engineering"""
+    if spec.get("version") != SPEC_VERSION:
+        raise ValueError(
+            f"feature_spec versão {spec.get('version')} incompatível com o código (versão {SPEC_VERSION})"
+        )
+    if spec.get("transform") != TRANSFORM_FINGERPRINT:
+        raise ValueError(
+            f"feature_spec foi gerado com outra lógica de features (transform {spec.get('transform')}, "
+            f"código {TRANSFORM_FINGERPRINT}); retreine os modelos"
+        )
+    if list(spec.get("features", [])) != FEATURES:
+        raise ValueError(f"Ordem de features dos modelos difere de FEATURES: {spec.get('features')}")
+    if dict(spec.get("tipo_dia_map", {})) != TIPO_DIA_MAP:
+        raise ValueError(f"tipo_dia_map dos modelos difere do código: {spec.get('tipo_dia_map')}")
+
+
+def check_scaler(scaler) -> None:
+    """Confere a ordem de features de scalers ajustados com DataFrame (pickles antigos).
+
+    A inferência passa o ndarray de `build_matrix`, já na ordem de FEATURES. Para esses
+    scalers só o aviso de nomes de features do sklearn é silenciado; o objeto não muda.
+    """
+    names = getattr(scaler, "feature_names_in_", None)
+    if names is None:
+        return
+    if list(names) != FEATURES:
+        raise ValueError(f"scaler.pkl foi treinado com outra ordem de features: {list(names)}")
+    warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+
+def save_spec(models_dir: Path, galpao_map: Dict[str, int]) -> Path:
+    path = Path(models_dir) / SPEC_FILE
+    joblib.dump(make_spec(galpao_map), path)
+    return path
+
+
+def load_spec(models_dir: Path) -> Dict:
+    """Carrega e valida `feature_spec.pkl`"""
+    spec = joblib.load(Path(models_dir) / SPEC_FILE)
+    check_spec(spec)
+    return spec
+
+
+def current_models_dir(models_dir: Path) -> Path:
+    """Versão publicada: `<models_dir>/atual` (symlink trocado por `publicar`) ou o próprio diretório.
+
+    Avisa quando há pickles soltos em `models_dir` mais novos que a versão publicada:
+    foram gravados sem `publicar` e não são servidos.
+    """
+    base = Path(models_dir)
+    atual = base / CURRENT_LINK
+    if not atual.is_dir():
+        return base
+    soltos = [f.stat().st_mtime_ns for f in base.glob("*.pkl")]
+    publicados = [f.stat().st_mtime_ns for f in atual.glob("*.pkl")]
+    if soltos and publicados and max(soltos) > max(publicados):
+        warnings.warn(
+            f"{base} tem pickles mais novos que a versão publicada em {atual.resolve()}; "
+            f"eles são ignorados. Publique o treino com retrain.publicar (como o notebook faz).",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+    return atual
+
+
+def artifacts_version(models_dir: Path) -> str:
+    """Hash de nome, tamanho e data de modificação dos pickles; muda a cada novo treino"""
+    h = hashlib.sha1()
+    for f in sorted(Path(models_dir).glob("*.pkl")):
+        st = f.stat()
+        h.update(f"{f.name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:12]
@@ -0,0 +1,161 @@
+"""Feature store online por galpão.
+
+Guarda, para cada galpão, o último estado da frota (motos em uso, disponíveis e total)
+e os saldos diários mais recentes (janela móvel de `janela` dias). É alimentado por
+eventos de estado da frota e de observação do dia, e consultado pelo `/predict/galpao`.
+
+Cada galpão tem um snapshot próprio em disco (`<galpão>.json`), regravado de forma
+atômica a cada evento daquele galpão. Em memória fica um cache por galpão, validado
+pelo `stat` do arquivo: a consulta custa um `stat` e um acesso ao dicionário, os
+workers do uvicorn enxergam os eventos uns dos outros, e um restart não reprocessa
+nada (os snapshots são lidos sob demanda).
+"""
+import fcntl
+import json
+import os
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+
+def _key(galpao: str) -> str:
+    key = galpao.upper().strip()
+    if not key:
+        raise ValueError("Nome de galpão vazio")
+    return key
+
+
+def _instante(em: Optional[datetime]) -> str:
+    """ISO 8601 em UTC com microssegundos (ordenável como texto)"""
+    if em is None:
+        em = datetime.now(timezone.utc)
+    elif em.tzinfo is None:
+        em = em.replace(tzinfo=timezone.utc)
+    return em.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+class FeatureStore:
+    """Estado por galpão com snapshot em disco e cache em memória"""
+
+    def __init__(self, path: Path, janela: int = 7):
+        self.path = Path(path)
+        self.janela = janela
+        self._cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+    def _file(self, galpao: str) -> Path:
+        return self.path / f"{quote(galpao, safe='')}.json"
+
+    def _novo(self, galpao: str) -> Dict[str, Any]:
+        return {
+            "galpao": galpao,
+            "motos_em_uso": None,
+            "motos_disponiveis": None,
+            "total_motos": None,
+            "frota_em": None,
+            "saldos": {},
+            "ultima_data": None,
+            "saldo_ultimo": None,
+            "saldo_medio": None,
+        }
+
+    # ---- leitura ----------------------------------------------------------------
+
+    def get(self, galpao: str) -> Optional[Dict[str, Any]]:
+        """Estado atual do galpão (None se nunca recebeu eventos)"""
+        galpao = _key(galpao)
+        try:
+            st = self._file(galpao).stat()
+        except FileNotFoundError:
+            self._cache.pop(galpao, None)
+            return None
+        # Cada gravação troca o arquivo (inode novo), então inode + mtime identificam a versão
+        assinatura = (st.st_ino, st.st_mtime_ns)
+        hit = self._cache.get(galpao)
+        if hit is not None and hit[0] == assinatura:
+            return hit[1]
+        with open(self._file(galpao)) as f:
+            estado = json.load(f)
+        self._cache[galpao] = (assinatura, estado)
+        return estado
+
+    def galpoes(self) -> List[str]:
+        if not self.path.exists():
+            return []
+        return sorted(unquote(p.stem) for p in self.path.glob("*.json"))
+
+    @staticmethod
+    def saldo_anterior(estado: Dict[str, Any], dia: date) -> Tuple[float, Optional[str]]:
+        """Saldo observado mais recente antes de `dia` (0 se não houver); percorre só a janela"""
+        dia_iso = dia.isoformat()
+        anteriores = [d for d in estado["saldos"] if d < dia_iso]
+        if not anteriores:
+            return 0.0, None
+        d = max(anteriores)
+        return float(estado["saldos"][d]), d
+
+    # ---- eventos ----------------------------------------------------------------
+
+    def _update(self, galpao: str, aplicar: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Lê, altera e regrava o snapshot do galpão sob um lock entre processos"""
+        galpao = _key(galpao)
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                atual = self.get(galpao) or self._novo(galpao)
+                estado = {**atual, "saldos": dict(atual["saldos"])}
+                aplicar(estado)
+                self._write(galpao, estado)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return estado
+
+    def _write(self, galpao: str, estado: Dict[str, Any]) -> None:
+        path = self._file(galpao)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        st = path.stat()
+        self._cache[galpao] = ((st.st_ino, st.st_mtime_ns), estado)
+
+    def frota(
+        self,
+        galpao: str,
+        motos_em_uso: float,
+        motos_disponiveis: float,
+        total_motos: Optional[float] = None,
+        em: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Evento de estado da frota; eventos mais antigos que o atual são ignorados"""
+        instante = _instante(em)
+        total = motos_em_uso + motos_disponiveis if total_motos is None else total_motos
+
+        def aplicar(estado):
+            if estado["frota_em"] is not None and estado["frota_em"] > instante:
+                return
+            estado.update(
+                motos_em_uso=float(motos_em_uso),
+                motos_disponiveis=float(motos_disponiveis),
+                total_motos=float(total),
+                frota_em=instante,
+            )
+
+        return self._update(galpao, aplicar)
+
+    def observacao(self, galpao: str, dia: date, motos_que_sairam: float, motos_que_voltaram: float) -> Dict[str, Any]:
+        """Evento de observação de um dia: registra o saldo (saídas - retornos) na janela móvel"""
+
+        def aplicar(estado):
+            saldos = estado["saldos"]
+            saldos[dia.isoformat()] = float(motos_que_sairam - motos_que_voltaram)
+            for d in sorted(saldos)[:-self.janela]:
+                del saldos[d]
+            estado["saldos"] = saldos = dict(sorted(saldos.items()))
+            if saldos:
+                estado["ultima_data"] = max(saldos)
+                estado["saldo_ultimo"] = saldos[estado["ultima_data"]]
+                estado["saldo_medio"] = round(sum(saldos.values()) / len(saldos), 4)
+
+        return self._update(galpao, aplicar)
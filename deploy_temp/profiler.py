@@ -0,0 +1,321 @@
+"""Profiler por amostragem para requisições em produção.
+
+Uma thread de fundo lê `sys._current_frames()` a cada `intervalo` segundos e conta
+as pilhas das threads que estão atendendo requisições sorteadas para o perfil
+(ou de todas as threads do processo). As pilhas são agregadas no formato
+"collapsed" (`raiz;...;folha contagem`), aceito por flamegraph.pl, speedscope e
+inferno.
+
+Quando o profiler não está habilitado, `wrap` devolve a função original: não há
+nenhum código extra no caminho da requisição.
+
+Com `pasta`, a sessão é compartilhada entre os workers do uvicorn: o controle fica
+em `sessao.json` (lido por uma thread de cada worker a cada `verificacao` segundos),
+cada worker grava as suas pilhas em `perfil-<pid>.json` e as consultas somam os
+arquivos da sessão atual, qualquer que seja o worker que as atende.
+"""
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _frame_label(code, module: str) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{module}:{name}"
+
+
+class SamplingProfiler:
+    """Amostrador de pilhas com sessões por janela de tempo.
+
+    Sem `pasta`, a sessão e os resultados valem só para o processo atual.
+    """
+
+    def __init__(self, enabled: bool, pasta: Optional[Path] = None, verificacao: float = 0.5):
+        self.enabled = enabled
+        self.pasta = Path(pasta) if pasta is not None else None
+        self.verificacao = verificacao
+        self._vigia: Optional[threading.Thread] = None
+        self._controle = threading.Lock()  # serializa início/fim entre a vigia e os endpoints
+        self.sessao: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._tids: Dict[int, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self._root_code = None
+        self.ativo = False
+        self.amostra = 1.0
+        self.intervalo = 0.005
+        self.todas_threads = False
+        self.inicio: Optional[float] = None
+        self.fim: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.amostras = 0
+        self.requisicoes_perfiladas = 0
+        self.requisicoes_ignoradas = 0
+
+    # ---- caminho da requisição -------------------------------------------------
+
+    def wrap(self, fn: Callable) -> Callable:
+        """Marca a thread que executa `fn` para amostragem enquanto houver sessão ativa"""
+        if not self.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def _perfilado(*args, **kwargs):
+            if not self.ativo:
+                return fn(*args, **kwargs)
+            if random.random() >= self.amostra:
+                with self._lock:
+                    self.requisicoes_ignoradas += 1
+                return fn(*args, **kwargs)
+            tid = threading.get_ident()
+            with self._lock:
+                self._tids[tid] = self._tids.get(tid, 0) + 1
+                self.requisicoes_perfiladas += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    if self._tids[tid] == 1:
+                        del self._tids[tid]
+                    else:
+                        self._tids[tid] -= 1
+
+        self._root_code = _perfilado.__code__
+        return _perfilado
+
+    # ---- sessão -----------------------------------------------------------------
+
+    def start(self, duracao: float, amostra: float, intervalo: float, todas_threads: bool) -> None:
+        """Inicia uma sessão nova (descarta o perfil anterior) em todos os workers"""
+        agora = time.time()
+        sessao = {
+            "id": uuid.uuid4().hex,
+            "inicio": agora,
+            "deadline": agora + duracao,
+            "fim": None,
+            "amostra": amostra,
+            "intervalo": intervalo,
+            "todas_threads": todas_threads,
+        }
+        if self.pasta is not None:
+            self.pasta.mkdir(parents=True, exist_ok=True)
+            for antigo in self.pasta.glob("perfil-*.json"):
+                antigo.unlink(missing_ok=True)
+            self._gravar(self.pasta / "sessao.json", sessao)
+        with self._controle:
+            self._iniciar_local(sessao)
+
+    def stop(self) -> None:
+        """Encerra a sessão atual (os outros workers param na próxima verificação)"""
+        sessao = self._sessao_atual()
+        if self.pasta is not None and sessao is not None and sessao["fim"] is None:
+            self._gravar(self.pasta / "sessao.json", {**sessao, "fim": time.time()})
+        with self._controle:
+            self._parar_local()
+
+    def sessao_ativa(self) -> bool:
+        sessao = self._sessao_atual()
+        return sessao is not None and sessao["fim"] is None and time.time() < sessao["deadline"]
+
+    def vigiar(self) -> None:
+        """Acompanha o `sessao.json` neste processo (chamar em cada worker, após o fork)"""
+        if not self.enabled or self.pasta is None or self._vigia is not None:
+            return
+        self._vigia = threading.Thread(target=self._vigiar, name="sampling-profiler-vigia", daemon=True)
+        self._vigia.start()
+
+    def _vigiar(self) -> None:
+        while True:
+            time.sleep(self.verificacao)
+            sessao = self._ler(self.pasta / "sessao.json")
+            if sessao is None:
+                continue
+            with self._controle:
+                local = self.sessao is not None and self.sessao["id"] == sessao["id"]
+                if not local and sessao["fim"] is None and time.time() < sessao["deadline"]:
+                    self._iniciar_local(sessao)
+                elif local and sessao["fim"] is not None and self.ativo:
+                    self._parar_local()
+
+    def _iniciar_local(self, sessao: Dict[str, Any]) -> None:
+        self._parar_local()
+        with self._lock:
+            self._stacks = Counter()
+            self._tids.clear()
+        self.sessao = sessao
+        self.amostra = sessao["amostra"]
+        self.intervalo = sessao["intervalo"]
+        self.todas_threads = sessao["todas_threads"]
+        self.amostras = self.requisicoes_perfiladas = self.requisicoes_ignoradas = 0
+        self.inicio = time.time()
+        self.fim = None
+        self.deadline = time.monotonic() + max(0.0, sessao["deadline"] - time.time())
+        self._stop.clear()
+        self.ativo = True
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _parar_local(self) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        publicado = time.monotonic()
+        while not self._stop.wait(self.intervalo):
+            if time.monotonic() >= self.deadline:
+                break
+            frames = sys._current_frames()
+            if self.todas_threads:
+                alvos = [f for tid, f in frames.items() if tid != own]
+            else:
+                with self._lock:
+                    tids = list(self._tids)
+                alvos = [frames[tid] for tid in tids if tid in frames]
+            pilhas = [self._collapse(f) for f in alvos]
+            del frames, alvos
+            with self._lock:
+                self._stacks.update(pilhas)
+                self.amostras += len(pilhas)
+            if time.monotonic() - publicado >= 1.0:
+                self._publicar()
+                publicado = time.monotonic()
+        self.ativo = False
+        self.fim = time.time()
+        self._publicar()
+
+    def _collapse(self, frame) -> str:
+        """Pilha da raiz à folha; no modo por requisição começa no endpoint"""
+        root = self._root_code
+        partes: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            if code is root and not self.todas_threads:
+                break
+            partes.append(_frame_label(code, frame.f_globals.get("__name__", "?")))
+            frame = frame.f_back
+        partes.reverse()
+        return ";".join(partes)
+
+    # ---- arquivos compartilhados ----------------------------------------------------
+
+    @staticmethod
+    def _ler(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _gravar(path: Path, dados: Dict[str, Any]) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(dados, f)
+        os.replace(tmp, path)
+
+    def _perfil_local(self) -> Dict[str, Any]:
+        with self._lock:
+            pilhas = dict(self._stacks)
+        return {
+            "pid": os.getpid(),
+            "sessao": self.sessao["id"] if self.sessao else None,
+            "amostras": self.amostras,
+            "requisicoes_perfiladas": self.requisicoes_perfiladas,
+            "requisicoes_ignoradas": self.requisicoes_ignoradas,
+            "pilhas": pilhas,
+        }
+
+    def _publicar(self) -> None:
+        if self.pasta is not None and self.sessao is not None:
+            self._gravar(self.pasta / f"perfil-{os.getpid()}.json", self._perfil_local())
+
+    def _sessao_atual(self) -> Optional[Dict[str, Any]]:
+        if self.pasta is None:
+            return self.sessao
+        return self._ler(self.pasta / "sessao.json")
+
+    def _perfis(self) -> List[Dict[str, Any]]:
+        """Perfis da sessão atual: o deste processo e, com `pasta`, os dos outros workers"""
+        sessao = self._sessao_atual()
+        if sessao is None:
+            return []
+        if self.pasta is None:
+            return [self._perfil_local()]
+        if self.sessao is not None and self.sessao["id"] == sessao["id"]:
+            self._publicar()
+        perfis = (self._ler(p) for p in sorted(self.pasta.glob("perfil-*.json")))
+        return [p for p in perfis if p is not None and p["sessao"] == sessao["id"]]
+
+    def _pilhas(self) -> Counter:
+        total: Counter = Counter()
+        for perfil in self._perfis():
+            total.update(perfil["pilhas"])
+        return total
+
+    # ---- resultados -------------------------------------------------------------
+
+    def collapsed(self) -> str:
+        """Pilhas agregadas no formato collapsed, da mais frequente para a menos"""
+        stacks = self._pilhas()
+        return "".join(f"{pilha} {n}\n" for pilha, n in stacks.most_common())
+
+    def top(self, limite: int = 15) -> List[Dict[str, Any]]:
+        """Frames por tempo inclusivo (percentual das amostras em que aparecem)"""
+        stacks = self._pilhas()
+        total = sum(stacks.values()) or 1
+        inclusivo: Counter = Counter()
+        proprio: Counter = Counter()
+        for pilha, n in stacks.items():
+            frames = pilha.split(";")
+            for frame in set(frames):
+                inclusivo[frame] += n
+            proprio[frames[-1]] += n
+        return [
+            {
+                "frame": frame,
+                "inclusivo_pct": round(100 * n / total, 1),
+                "proprio_pct": round(100 * proprio[frame] / total, 1),
+            }
+            for frame, n in inclusivo.most_common(limite)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado da sessão e contadores somados entre os workers que a executaram"""
+        sessao = self._sessao_atual()
+        perfis = self._perfis()
+        pilhas: set = set()
+        for perfil in perfis:
+            pilhas.update(perfil["pilhas"])
+        duracao = 0.0
+        if sessao is not None:
+            fim = min(x for x in (sessao["fim"], sessao["deadline"], time.time()) if x is not None)
+            duracao = round(fim - sessao["inicio"], 2)
+        return {
+            "enabled": self.enabled,
+            "ativo": self.sessao_ativa(),
+            "amostra": sessao["amostra"] if sessao else self.amostra,
+            "intervalo_ms": round((sessao["intervalo"] if sessao else self.intervalo) * 1000, 3),
+            "todas_threads": sessao["todas_threads"] if sessao else self.todas_threads,
+            "duracao_s": duracao,
+            "amostras": sum(p["amostras"] for p in perfis),
+            "requisicoes_perfiladas": sum(p["requisicoes_perfiladas"] for p in perfis),
+            "requisicoes_ignoradas": sum(p["requisicoes_ignoradas"] for p in perfis),
+            "pilhas_distintas": len(pilhas),
+            "pid": os.getpid(),
+            "workers": sorted(p["pid"] for p in perfis),
+        }
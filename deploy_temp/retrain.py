@@ -0,0 +1,303 @@
+"""Retreino incremental dos modelos de saídas e voltas.
+
+Em vez de reexecutar o notebook sobre o histórico inteiro, cada rodada:
+
+1. lê os dias novos (CSV com as colunas de `dados_mottu_corrigido.csv`);
+2. lê só o final do histórico (`contexto` linhas, a partir do fim do arquivo);
+3. separa o holdout: os dias novos mais recentes, no máximo `fracao_holdout` deles e
+   `holdout` dias. Nenhum modelo viu esses dias, então a comparação entre o modelo
+   anterior e o novo não favorece nenhum dos dois. Com poucos dias novos (holdout
+   abaixo de `HOLDOUT_MIN`) não há holdout: todos treinam e as métricas publicadas
+   são mantidas;
+4. treina `arvores_novas` árvores por modelo com `warm_start` nos demais dias novos
+   + `contexto` dias anteriores, e aposenta as mais antigas, mantendo o tamanho do
+   ensemble. Os dias do holdout entram no treino da rodada seguinte, via `contexto`;
+5. grava a versão completa (modelos, métricas, scaler e spec) em `versoes/<versão>/`.
+   O symlink `atual` passa a apontar para ela em uma única troca atômica, e só então
+   os dias novos entram no histórico.
+
+O custo depende do volume de dias novos (mais o tamanho fixo do contexto), não do
+tamanho do histórico. O scaler fica congelado, porque as árvores
+antigas foram treinadas na escala dele; galpões novos recebem os próximos códigos.
+
+Uso:
+    python deploy_temp/retrain.py novos_dias.csv [--dados dados_mottu_corrigido.csv] [--models-dir models]
+"""
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from feature_engineering import (
+    CURRENT_LINK,
+    SPEC_FILE,
+    artifacts_version,
+    build_frame_matrix,
+    check_scaler,
+    current_models_dir,
+    extend_galpao_map,
+    load_spec,
+    make_spec,
+)
+
+COLUNAS = [
+    "galpao", "dia_semana", "motos_em_uso", "motos_que_sairam", "motos_que_voltaram",
+    "motos_disponiveis", "choveu", "total_motos", "feriado", "tipo_dia", "saldo_dia",
+]
+TEXTO = {"galpao", "tipo_dia"}
+ALVOS = {"model_saida": "motos_que_sairam", "model_volta": "motos_que_voltaram"}
+
+_BLOCO = 1 << 16
+# Menos dias que isso não formam um holdout (as métricas seriam só ruído)
+HOLDOUT_MIN = 5
+
+
+def read_rows(path: Path) -> Tuple[List[str], List[List[str]]]:
+    """Cabeçalho e linhas de um CSV pequeno (os dias novos)"""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        return header, [r for r in reader if r]
+
+
+def tail_rows(path: Path, n: int) -> Tuple[List[str], List[List[str]]]:
+    """Cabeçalho e as últimas `n` linhas do CSV, lendo blocos a partir do fim do arquivo"""
+    with open(path, "rb") as f:
+        header = f.readline().decode()
+        inicio = f.tell()
+        pos = f.seek(0, os.SEEK_END)
+        dados = b""
+        # n + 1 quebras de linha garantem n linhas completas
+        while pos > inicio and dados.count(b"\n") <= n:
+            passo = min(_BLOCO, pos - inicio)
+            pos -= passo
+            f.seek(pos)
+            dados = f.read(passo) + dados
+    linhas = dados.decode().splitlines()
+    if pos > inicio:
+        linhas = linhas[1:]  # a primeira linha do bloco pode estar cortada
+    linhas = [linha for linha in linhas if linha.strip()][-n:] if n else []
+    return next(csv.reader([header])), list(csv.reader(linhas))
+
+
+def append_rows(path: Path, rows: List[List[str]]) -> None:
+    """Acrescenta linhas ao histórico (já na ordem de colunas do arquivo)"""
+    with open(path, "rb") as f:
+        tamanho = f.seek(0, os.SEEK_END)
+        if tamanho:
+            f.seek(-1, os.SEEK_END)
+        sem_quebra = tamanho > 0 and f.read(1) != b"\n"
+    with open(path, "a", newline="") as f:
+        if sem_quebra:
+            f.write("\n")
+        csv.writer(f, lineterminator="\n").writerows(rows)
+
+
+def columns(header: List[str], rows: List[List[str]]) -> Dict[str, np.ndarray]:
+    """Linhas do CSV -> colunas numpy (texto para galpão/tipo_dia, float64 no resto)"""
+    faltando = [c for c in COLUNAS if c not in header]
+    if faltando:
+        raise ValueError(f"Colunas ausentes: {faltando}")
+    cols = {}
+    for c in COLUNAS:
+        i = header.index(c)
+        valores = [r[i] for r in rows]
+        cols[c] = np.asarray(valores, dtype=str) if c in TEXTO else np.asarray(valores, dtype=np.float64)
+    return cols
+
+
+def grow_forest(model, X: np.ndarray, y: np.ndarray, arvores_novas: int, seed: int):
+    """Acrescenta `arvores_novas` árvores treinadas em (X, y) e aposenta as mais antigas"""
+    tamanho = len(model.estimators_)
+    model.set_params(warm_start=True, n_estimators=tamanho + arvores_novas, random_state=seed)
+    model.fit(X, y)
+    model.estimators_ = model.estimators_[arvores_novas:]
+    model.set_params(warm_start=False, n_estimators=tamanho)
+    return model
+
+
+def _metricas(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    mse = mean_squared_error(y_true, y_pred)
+    return {
+        "mse": float(mse),
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "rmse": float(np.sqrt(mse)),
+        "r2": float(r2_score(y_true, y_pred)),
+    }
+
+
+def publicar(
+    models_dir: Path, origem: Optional[Path], artefatos: Dict[str, object], manter: int = 5
+) -> Path:
+    """Publica uma versão completa dos artefatos, trocando o symlink `atual` de uma vez.
+
+    Usado pelo retreino incremental e pelo treino completo do notebook (`origem=None`).
+    Os arquivos de `origem` que não estão em `artefatos` (scaler, features, ...) são
+    copiados para a versão nova; tudo é gravado em um diretório temporário, renomeado
+    para `versoes/<data>-<versão>` e só então o symlink é trocado. Uma falha antes da
+    troca não altera o que está publicado. Ficam as `manter` versões mais recentes.
+    """
+    versoes = models_dir / "versoes"
+    versoes.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=".nova-", dir=versoes))
+    try:
+        os.chmod(staging, 0o755)
+        for f in origem.iterdir() if origem is not None else ():
+            if f.is_file() and not f.name.startswith(".") and f.name not in artefatos:
+                shutil.copy2(f, staging / f.name)
+        for nome, obj in artefatos.items():
+            joblib.dump(obj, staging / nome)
+        destino = versoes / f"{time.strftime('%Y%m%d-%H%M%S')}-{artifacts_version(staging)}"
+        os.rename(staging, destino)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    link = models_dir / f".{CURRENT_LINK}.tmp"
+    link.unlink(missing_ok=True)
+    os.symlink(os.path.relpath(destino, models_dir), link)
+    os.replace(link, models_dir / CURRENT_LINK)
+
+    antigas = sorted(d for d in versoes.iterdir() if d.is_dir() and not d.name.startswith("."))
+    for d in antigas[:-manter]:
+        if d != destino:
+            shutil.rmtree(d, ignore_errors=True)
+    return destino
+
+
+def retreinar(
+    novos: Path,
+    dados: Path,
+    models_dir: Path,
+    arvores_novas: int = 30,
+    contexto: int = 60,
+    holdout: int = 30,
+    fracao_holdout: float = 0.3,
+    seed: Optional[int] = None,
+) -> Dict:
+    """Executa uma rodada de retreino incremental e publica a nova versão"""
+    tempos = {}
+    t0 = time.perf_counter()
+
+    header_novo, linhas_novas = read_rows(novos)
+    if not linhas_novas:
+        raise ValueError(f"{novos} não tem dias novos")
+    header, historico = tail_rows(dados, contexto)
+    faltando = [c for c in header if c not in header_novo]
+    if faltando:
+        raise ValueError(f"Colunas do histórico ausentes em {novos}: {faltando}")
+    linhas_novas = [[r[header_novo.index(c)] for c in header] for r in linhas_novas]
+
+    # Holdout só com dias novos, sem engolir o incremento inteiro
+    n_holdout = min(holdout, int(len(linhas_novas) * fracao_holdout))
+    if n_holdout < HOLDOUT_MIN:
+        n_holdout = 0
+    cols = columns(header, historico + linhas_novas)
+    fim_treino = len(historico) + len(linhas_novas) - n_holdout
+
+    origem = current_models_dir(models_dir)
+    spec = load_spec(origem)
+    galpao_map = extend_galpao_map(spec["galpao_map"], cols["galpao"])
+    scaler = joblib.load(origem / "scaler.pkl")
+    check_scaler(scaler)
+
+    X = scaler.transform(build_frame_matrix(cols, galpao_map))
+    X_treino, X_holdout = X[:fim_treino], X[fim_treino:]
+    if seed is None:
+        seed = zlib.crc32(repr(linhas_novas).encode())
+    tempos["leitura_s"] = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    modelos, metricas, anteriores = {}, {}, {}
+    publicadas = joblib.load(origem / "metricas.pkl")
+    for nome, alvo in ALVOS.items():
+        model = joblib.load(origem / f"{nome}.pkl")
+        y_treino, y_holdout = cols[alvo][:fim_treino], cols[alvo][fim_treino:]
+        if n_holdout:
+            anteriores[nome] = _metricas(y_holdout, model.predict(X_holdout))
+        grow_forest(model, X_treino, y_treino, arvores_novas, seed)
+        if n_holdout:
+            metricas[nome] = _metricas(y_holdout, model.predict(X_holdout))
+        else:
+            anteriores[nome] = metricas[nome] = publicadas[nome]
+        modelos[nome] = model
+    tempos["treino_s"] = time.perf_counter() - t1
+
+    t2 = time.perf_counter()
+    metricas["retreino"] = {
+        "tipo": "incremental",
+        "dias_novos": len(linhas_novas),
+        "linhas_treino": len(X_treino),
+        "holdout": n_holdout,
+        "arvores_novas": arvores_novas,
+        "n_estimators": len(modelos["model_saida"].estimators_),
+    }
+    artefatos = {f"{nome}.pkl": model for nome, model in modelos.items()}
+    artefatos["metricas.pkl"] = metricas
+    if galpao_map != spec["galpao_map"]:
+        artefatos[SPEC_FILE] = make_spec(galpao_map)
+    publicado = publicar(models_dir, origem, artefatos)
+    # Só depois da troca: se a publicação falhar, uma nova rodada não duplica os dias no CSV
+    append_rows(dados, linhas_novas)
+    tempos["publicacao_s"] = time.perf_counter() - t2
+    tempos["total_s"] = time.perf_counter() - t0
+
+    return {
+        "versao": artifacts_version(publicado),
+        "diretorio": publicado,
+        "metricas": metricas,
+        "metricas_anteriores": anteriores,
+        "galpoes_novos": sorted(set(galpao_map) - set(spec["galpao_map"])),
+        "tempos": tempos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retreino incremental (warm_start) dos modelos")
+    parser.add_argument("novos", type=Path, help="CSV com os dias novos")
+    parser.add_argument("--dados", type=Path, default=Path("dados_mottu_corrigido.csv"), help="histórico de treino")
+    parser.add_argument("--models-dir", type=Path, default=Path("models"))
+    parser.add_argument("--arvores-novas", type=int, default=30, help="árvores novas (e aposentadas) por modelo")
+    parser.add_argument("--contexto", type=int, default=60, help="dias anteriores incluídos no treino das árvores novas")
+    parser.add_argument("--holdout", type=int, default=30, help="máximo de dias novos (os mais recentes) usados nas métricas")
+    parser.add_argument("--fracao-holdout", type=float, default=0.3, help="fração máxima dos dias novos usada no holdout")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    versao_anterior = artifacts_version(current_models_dir(args.models_dir))
+    out = retreinar(
+        args.novos, args.dados, args.models_dir,
+        arvores_novas=args.arvores_novas, contexto=args.contexto,
+        holdout=args.holdout, fracao_holdout=args.fracao_holdout, seed=args.seed,
+    )
+
+    info = out["metricas"]["retreino"]
+    print(f"Dias novos: {info['dias_novos']} | linhas de treino: {info['linhas_treino']} | "
+          f"holdout: {info['holdout']} dias | árvores: +{info['arvores_novas']}/-{info['arvores_novas']} "
+          f"(ensemble de {info['n_estimators']})")
+    if out["galpoes_novos"]:
+        print(f"Galpões novos: {out['galpoes_novos']}")
+    if not info["holdout"]:
+        print(f"  Sem holdout (menos de {HOLDOUT_MIN} dias separáveis): métricas publicadas mantidas")
+    else:
+        for nome in ALVOS:
+            antes, depois = out["metricas_anteriores"][nome], out["metricas"][nome]
+            print(f"  {nome}: R² {antes['r2']:.4f} -> {depois['r2']:.4f} | MAE {antes['mae']:.2f} -> {depois['mae']:.2f}")
+    t = out["tempos"]
+    print(f"Tempo: {t['total_s']:.2f}s (leitura {t['leitura_s']:.2f}s, treino {t['treino_s']:.2f}s, "
+          f"publicação {t['publicacao_s']:.2f}s)")
+    print(f"Versão: {versao_anterior} -> {out['versao']} ({out['diretorio']})")
+    print("Reinicie a API (ou os workers) para servir a nova versão.")
+
+
+if __name__ == "__main__":
+    main()